@@ -3,7 +3,6 @@ Django Admin Configuration for the Educational Center Management System.
 Cleaned up version with improved Excel import.
 """
 import pandas as pd
-from io import BytesIO
 
 from django import forms
 from django.contrib import admin
@@ -11,16 +10,18 @@ from django.contrib.admin import SimpleListFilter
 from django.shortcuts import render, redirect
 from django.urls import path
 from django.contrib import messages
-from django.db import transaction
 from django.http import HttpResponse
+from django.utils.html import format_html
 
 from .models import (
     News, NewsImage, GalleryItem, GalleryImage, Listener, Teacher, Personnel,
     Course, JournalIssue, Document, Statistics, YearlyStatistics,
     AppContent, JournalSettings, InternationalRelation, ForeignPartner,
     CollaborationProject, InternationalPhoto, InternationalVideo, StudentTrainingRecord,
-    ArtGalleryItem, ArtGalleryImage
+    ArtGalleryItem, ArtGalleryImage, ImportJob
 )
+from . import search
+from .exporters import export_listeners
 
 
 # Custom Admin Site Configuration
@@ -37,6 +38,16 @@ class ExcelImportForm(forms.Form):
     )
 
 
+class FullTextSearchMixin:
+    """Answer the changelist search box from the full-text index when it exists."""
+
+    def get_search_results(self, request, queryset, search_term):
+        results = search.filter_queryset(queryset, search_term)
+        if results is None:
+            return super().get_search_results(request, queryset, search_term)
+        return results, False
+
+
 class ListenerRecordTypeFilter(SimpleListFilter):
     """Filter listeners by record type (MO/QT)."""
     title = 'Sertifikat turi'
@@ -140,7 +151,7 @@ class GalleryItemAdmin(admin.ModelAdmin):
 
 
 @admin.register(Listener)
-class ListenerAdmin(admin.ModelAdmin):
+class ListenerAdmin(FullTextSearchMixin, admin.ModelAdmin):
     """
     Admin configuration for Listener model with bulk import.
     Supports both MO (Malaka oshirish) and QT (Qayta tayyorlash) types.
@@ -206,99 +217,17 @@ class ListenerAdmin(admin.ModelAdmin):
                 }
                 record_type = mapping.get(str(raw_type).strip().upper(), 'MO')
 
-                try:
-                    # Read all columns as strings to preserve leading zeros
-                    df = pd.read_excel(BytesIO(excel_file.read()), dtype=str)
-                    
-                    found_columns = list(df.columns)
-                    print(f"Excel ustunlari: {found_columns}")
-
-                    # Flexible column mapping - supports both MO and QT formats
-                    column_mapping = {
-                        'full_name': ['Tinglovchi', 'F.I.SH', 'FIO', 'Ism', 'Ismi', 'F.I.O', 'Familiya'],
-                        'workplace': ['Asosiy ish joyi', 'Ish joyi', 'Lavozimi', 'Tashkilot', 'Muassasa', 
-                                      'Ta\'lim muassasasi', 'Qayta tayyorlagan muassasa'],
-                        'course_type': ['Kursi', 'Kurs', 'Yo\'nalishi', 'Yo\'nalish', 
-                                       'Qayta tayyorlash kursi', 'Kurs nomi'],
-                        'series': ['Seriyasi', 'Seriya', 'Sertifikat seriyasi', 'Diplom seriyasi'],
-                        'number': ['Raqami', 'Raqam', '№', 'Sertifikat raqami', 'Diplom raqami'],
-                        'duration': ["O'qish muddati (davri)", "O'qish muddati", 'Muddat', 'Davri', 
-                                    'Kurs davri', 'Boshlanish - tugash'],
-                    }
-
-                    # Find matching columns (case-insensitive with partial match)
-                    def find_column(possible_names, df_columns):
-                        df_columns_lower = {col.lower().strip(): col for col in df_columns}
-                        for name in possible_names:
-                            name_lower = name.lower().strip()
-                            if name_lower in df_columns_lower:
-                                return df_columns_lower[name_lower]
-                            # Partial match
-                            for col_lower, col_orig in df_columns_lower.items():
-                                if name_lower in col_lower or col_lower in name_lower:
-                                    return col_orig
-                        return None
-
-                    # Build actual column mapping
-                    actual_mapping = {}
-                    for model_field, possible_names in column_mapping.items():
-                        found_col = find_column(possible_names, df.columns)
-                        if found_col:
-                            actual_mapping[found_col] = model_field
-                            print(f"Topildi: '{found_col}' -> {model_field}")
-                    
-                    print(f"Topilgan ustunlar: {actual_mapping}")
-
-                    created_count = 0
-                    updated_count = 0
-                    skipped_count = 0
-
-                    with transaction.atomic():
-                        for idx, row in df.iterrows():
-                            listener_data = {'record_type': record_type}
-
-                            for excel_col, model_field in actual_mapping.items():
-                                value = row[excel_col]
-                                if pd.notna(value):
-                                    listener_data[model_field] = str(value).strip()
-
-                            # Skip if no name found
-                            if not listener_data.get('full_name'):
-                                skipped_count += 1
-                                continue
-
-                            # Auto-generate number if missing
-                            if not listener_data.get('number'):
-                                listener_data['number'] = str(idx + 1).zfill(6)
-
-                            # Auto-set series if missing
-                            if not listener_data.get('series'):
-                                listener_data['series'] = record_type
-
-                            # Check for existing record
-                            existing = Listener.objects.filter(
-                                series=listener_data.get('series', record_type),
-                                number=listener_data['number']
-                            ).first()
-
-                            if existing:
-                                for key, value in listener_data.items():
-                                    setattr(existing, key, value)
-                                existing.save()
-                                updated_count += 1
-                            else:
-                                Listener.objects.create(**listener_data)
-                                created_count += 1
-
-                    msg = f"Muvaffaqiyat! {created_count} ta yangi qo'shildi, {updated_count} ta yangilandi."
-                    if skipped_count > 0:
-                        msg += f" {skipped_count} ta qator o'tkazib yuborildi (ism topilmadi)."
-                    
-                    messages.success(request, msg)
-                    return redirect('..')
-
-                except Exception as e:
-                    messages.error(request, f"Xatolik: {str(e)}")
+                job = ImportJob.objects.create(
+                    kind=ImportJob.KIND_LISTENER,
+                    record_type=record_type,
+                    file=excel_file,
+                    original_name=excel_file.name,
+                )
+                messages.success(
+                    request,
+                    f"Fayl navbatga qo'yildi ({job.original_name}). Import jarayonini shu sahifada kuzating."
+                )
+                return redirect('admin:core_importjob_changelist')
 
         form = ExcelImportForm()
         context = {
@@ -309,33 +238,10 @@ class ListenerAdmin(admin.ModelAdmin):
         return render(request, 'admin/excel_import.html', context)
 
     def export_excel(self, request):
-        """Export listeners to Excel file."""
+        """Export listeners as a streamed Excel, CSV (?format=csv) or NDJSON (?format=ndjson) file."""
         record_type = request.GET.get('record_type', None)
-        queryset = Listener.objects.all()
-        if record_type:
-            queryset = queryset.filter(record_type=record_type)
-
-        data = []
-        for listener in queryset:
-            data.append({
-                'F.I.SH': listener.full_name,
-                'Ish joyi': listener.workplace,
-                'Yo\'nalish': listener.course_type,
-                'Seriya': listener.series,
-                'Raqam': listener.number,
-                "O'qish muddati (davri)": listener.duration,
-                'Turi': listener.get_record_type_display(),
-            })
-
-        df = pd.DataFrame(data)
-
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        filename = f"tinglovchilar_{record_type or 'all'}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        df.to_excel(response, index=False, engine='openpyxl')
-        return response
+        export_format = request.GET.get('format', 'xlsx').lower()
+        return export_listeners(record_type, export_format)
 
     def download_template(self, request):
         """Download Excel template for import."""
@@ -397,7 +303,7 @@ class TeacherAdmin(admin.ModelAdmin):
 
 
 @admin.register(StudentTrainingRecord)
-class StudentTrainingRecordAdmin(admin.ModelAdmin):
+class StudentTrainingRecordAdmin(FullTextSearchMixin, admin.ModelAdmin):
     """Admin for students page records with Excel import."""
     list_display = ['full_name', 'workplace', 'course_name', 'training_time', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
@@ -419,78 +325,16 @@ class StudentTrainingRecordAdmin(admin.ModelAdmin):
             form = ExcelImportForm(request.POST, request.FILES)
             if form.is_valid():
                 excel_file = request.FILES['excel_file']
-                try:
-                    if excel_file.name.lower().endswith('.csv'):
-                        df = pd.read_csv(BytesIO(excel_file.read()), dtype=str)
-                    else:
-                        df = pd.read_excel(BytesIO(excel_file.read()), dtype=str)
-
-                    column_mapping = {
-                        'full_name': ['F.I.SH', 'FIO', 'F.I.O', 'Tinglovchi', 'Ism familiya'],
-                        'workplace': ['Asosiy ish joyi', 'Ish joyi', 'Tashkilot', 'Muassasa'],
-                        'course_name': ['Malaka oshirish yo\'nalishi', 'Malaka oshirish yonalishi', 'Yo\'nalish', 'Kurs', 'Kursi'],
-                        'training_time': ['Malaka oshirish vaqti', 'O\'qish muddati', 'Muddat', 'Vaqt', 'Oy'],
-                    }
-
-                    def find_column(possible_names, columns):
-                        columns_lower = {c.lower().strip(): c for c in columns}
-                        for name in possible_names:
-                            key = name.lower().strip()
-                            if key in columns_lower:
-                                return columns_lower[key]
-                            for col_key, col_orig in columns_lower.items():
-                                if key in col_key or col_key in key:
-                                    return col_orig
-                        return None
-
-                    actual_mapping = {}
-                    for model_field, candidates in column_mapping.items():
-                        found = find_column(candidates, df.columns)
-                        if found:
-                            actual_mapping[found] = model_field
-
-                    if not any(v == 'full_name' for v in actual_mapping.values()):
-                        messages.error(request, "Excel faylda 'F.I.SH' ustuni topilmadi.")
-                        return redirect('..')
-
-                    created_count = 0
-                    updated_count = 0
-                    skipped_count = 0
-
-                    with transaction.atomic():
-                        for _, row in df.iterrows():
-                            data = {}
-                            for excel_col, model_field in actual_mapping.items():
-                                val = row.get(excel_col)
-                                if pd.notna(val):
-                                    data[model_field] = str(val).strip()
-
-                            full_name = data.get('full_name', '')
-                            if not full_name:
-                                skipped_count += 1
-                                continue
-
-                            obj, created = StudentTrainingRecord.objects.update_or_create(
-                                full_name=full_name,
-                                workplace=data.get('workplace', ''),
-                                course_name=data.get('course_name', ''),
-                                defaults={
-                                    'training_time': data.get('training_time', ''),
-                                    'is_active': True,
-                                }
-                            )
-                            if created:
-                                created_count += 1
-                            else:
-                                updated_count += 1
-
-                    messages.success(
-                        request,
-                        f"Muvaffaqiyatli import qilindi: {created_count} ta yangi, {updated_count} ta yangilandi, {skipped_count} ta o'tkazib yuborildi."
-                    )
-                    return redirect('..')
-                except Exception as exc:
-                    messages.error(request, f"Import xatoligi: {exc}")
+                job = ImportJob.objects.create(
+                    kind=ImportJob.KIND_STUDENT_RECORD,
+                    file=excel_file,
+                    original_name=excel_file.name,
+                )
+                messages.success(
+                    request,
+                    f"Fayl navbatga qo'yildi ({job.original_name}). Import jarayonini shu sahifada kuzating."
+                )
+                return redirect('admin:core_importjob_changelist')
 
         form = ExcelImportForm()
         context = {
@@ -515,6 +359,50 @@ class StudentTrainingRecordAdmin(admin.ModelAdmin):
         return response
 
 
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    """
+    Admin for background Excel imports.
+    Jobs are created by the import views and processed by ``manage.py run_import_worker``.
+    """
+    list_display = ['__str__', 'kind', 'record_type', 'status', 'progress', 'created_count',
+                    'updated_count', 'skipped_count', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    ordering = ['-created_at']
+    change_list_template = "admin/import_job_change_list.html"
+    readonly_fields = ['kind', 'record_type', 'file', 'original_name', 'status', 'total_rows', 'rows_done',
+                       'created_count', 'updated_count', 'skipped_count', 'error', 'started_at', 'finished_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def progress(self, obj):
+        if obj.status == ImportJob.STATUS_DONE:
+            percent = 100
+        elif obj.total_rows:
+            percent = min(100, int(obj.rows_done * 100 / obj.total_rows))
+        else:
+            percent = 0
+        label = f"{obj.rows_done} / {obj.total_rows}" if obj.total_rows else str(obj.rows_done)
+        return format_html(
+            '<div style="width:140px;background:#e5e7eb;border-radius:6px;overflow:hidden;">'
+            '<div style="width:{}%;background:#10b981;height:8px;"></div></div>'
+            '<small>{} ({}%)</small>',
+            percent, label, percent,
+        )
+    progress.short_description = 'Jarayon'
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['has_active_jobs'] = ImportJob.objects.filter(
+            status__in=[ImportJob.STATUS_QUEUED, ImportJob.STATUS_RUNNING]
+        ).exists()
+        return super().changelist_view(request, extra_context=extra_context)
+
+
 @admin.register(Personnel)
 class PersonnelAdmin(admin.ModelAdmin):
     """Admin configuration for Personnel model."""
@@ -550,17 +438,19 @@ class CourseAdmin(admin.ModelAdmin):
 @admin.register(JournalIssue)
 class JournalIssueAdmin(admin.ModelAdmin):
     """Admin configuration for JournalIssue model - simplified."""
-    list_display = ['__str__', 'year', 'issue_number', 'is_active']
+    list_display = ['__str__', 'year', 'issue_number', 'page_count', 'is_active']
     list_filter = ['year', 'is_active']
     search_fields = ['year', 'issue_number']
     ordering = ['-year', '-created_at']
+    readonly_fields = ['page_count', 'file_size', 'thumbnail_generated', 'text_extracted']
 
     fieldsets = (
         ('Jurnal ma\'lumotlari', {
             'fields': ('year', 'issue_number')
         }),
         ('Fayllar', {
-            'fields': ('pdf_file', 'thumbnail')
+            'fields': ('pdf_file', 'thumbnail', 'page_count', 'file_size', 'thumbnail_generated', 'text_extracted'),
+            'description': "Muqova rasmi yuklanmasa, PDF ning birinchi sahifasidan avtomatik yaratiladi."
         }),
         ('Sozlamalar', {
             'fields': ('is_active',)
@@ -571,15 +461,19 @@ class JournalIssueAdmin(admin.ModelAdmin):
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
     """Admin configuration for Document model - simplified."""
-    list_display = ['title', 'category', 'is_active', 'created_at']
+    list_display = ['title', 'category', 'extension', 'file_size', 'is_active', 'created_at']
     list_filter = ['category', 'is_active']
     search_fields = ['title']
     ordering = ['-created_at']
+    readonly_fields = ['file_size', 'mime_type', 'extension', 'content_hash']
 
     fieldsets = (
         ('Hujjat', {
             'fields': ('title', 'category', 'file')
         }),
+        ('Fayl ma\'lumotlari', {
+            'fields': ('file_size', 'mime_type', 'extension', 'content_hash')
+        }),
         ('Sozlamalar', {
             'fields': ('is_active',)
         }),
@@ -601,10 +495,17 @@ class StatisticsAdmin(admin.ModelAdmin):
 
 @admin.register(YearlyStatistics)
 class YearlyStatisticsAdmin(admin.ModelAdmin):
-    """Admin configuration for YearlyStatistics model."""
-    list_display = ['year', 'professional_development_count', 'retraining_count']
+    """Admin configuration for YearlyStatistics model (read-only, see core.counters)."""
+    list_display = ['year', 'professional_development_count', 'retraining_count', 'student_record_count', 'updated_at']
     ordering = ['-year']
 
+    def has_add_permission(self, request):
+        # Rows are created by the registry counters
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(AppContent)
 class AppContentAdmin(admin.ModelAdmin):
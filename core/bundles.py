@@ -0,0 +1,181 @@
+"""
+Zip bundles of the public documents of one category.
+
+A bundle is stored as ``bundles/documents/<category>-<fingerprint>.zip``,
+where the fingerprint hashes the ids, titles and content hashes of the
+category's active documents. Any change to the category gives a new name,
+so a bundle is built once on the first download after a change and then
+served like any other stored file.
+
+The archive is written under a temporary ``.part`` name next to its final
+one and renamed into place, so a bundle name never points at a half-written
+file. A replaced bundle may still be downloaded (or resumed with a Range
+request) by a client that fetched its URL earlier, so it is only removed by
+a later rebuild, once its successor is ``DOCUMENT_BUNDLE_RETENTION`` seconds
+old.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .models import Document
+
+
+BUNDLE_DIR = 'bundles/documents'
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# Seconds a replaced bundle (and a leftover .part file) is kept for downloads already under way
+RETENTION = getattr(settings, 'DOCUMENT_BUNDLE_RETENTION', 60 * 60 * 24)
+
+PART_SUFFIX = '.part'
+
+# Already compressed formats are stored as they are
+STORED_EXTENSIONS = {
+    'pdf', 'zip', 'rar', '7z', 'gz', 'jpg', 'jpeg', 'png', 'webp', 'docx', 'xlsx', 'pptx', 'mp4',
+}
+
+
+def bundle_documents(category):
+    return list(
+        Document.objects.filter(is_active=True, category=category)
+        .exclude(file='')
+        .order_by('-created_at', '-id')
+    )
+
+
+def fingerprint(documents):
+    digest = hashlib.sha256()
+    for document in documents:
+        # Rows saved before content_hash existed fall back to their unique stored name
+        digest.update(f'{document.pk}\x1f{document.title}\x1f{document.content_hash or document.file.name}\x1e'.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def bundle_name(category, documents):
+    return f'{BUNDLE_DIR}/{category}-{fingerprint(documents)}.zip'
+
+
+def entry_names(documents):
+    """Readable, unique names inside the archive: the title plus the file's extension."""
+    used = set()
+    for document in documents:
+        extension = os.path.splitext(document.file.name)[1].lower()
+        base = document.title.replace('/', '-').replace('\\', '-').strip() or os.path.basename(document.file.name)
+        name = f'{base}{extension}'
+        counter = 2
+        while name.casefold() in used:
+            name = f'{base} ({counter}){extension}'
+            counter += 1
+        used.add(name.casefold())
+        yield document, name
+
+
+def write_archive(handle, documents):
+    with zipfile.ZipFile(handle, 'w') as archive:
+        for document, entry in entry_names(documents):
+            extension = (document.extension or os.path.splitext(document.file.name)[1].lstrip('.')).lower()
+            compression = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            info = zipfile.ZipInfo(entry, date_time=timezone.localtime(document.created_at).timetuple()[:6])
+            info.compress_type = compression
+            try:
+                source = document.file.open('rb')
+            except FileNotFoundError:
+                continue
+            # force_zip64: the size isn't known to zipfile before streaming
+            with source, archive.open(info, 'w', force_zip64=True) as target:
+                shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+
+
+def _local_path(storage, name):
+    try:
+        return storage.path(name)
+    except NotImplementedError:
+        return None
+
+
+def write_bundle(storage, name, documents):
+    """Build the archive under a temporary name, then move it to ``name`` in one step."""
+    path = _local_path(storage, name)
+    if path is None:
+        # Remote storages upload the finished file in one request anyway
+        with tempfile.TemporaryFile() as handle:
+            write_archive(handle, documents)
+            handle.seek(0)
+            saved = storage.save(name, File(handle))
+        if saved != name:
+            # Another request stored the same bundle first
+            storage.delete(saved)
+        return
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle = tempfile.NamedTemporaryFile(dir=directory, prefix=f'{os.path.basename(path)}.', suffix=PART_SUFFIX, delete=False)
+    try:
+        with handle:
+            write_archive(handle, documents)
+        # NamedTemporaryFile creates the file readable by its owner only
+        os.chmod(handle.name, getattr(storage, 'file_permissions_mode', None) or 0o644)
+        # Atomic on one filesystem; a concurrent build of the same bundle writes identical bytes
+        os.replace(handle.name, path)
+    except BaseException:
+        os.unlink(handle.name)
+        raise
+
+
+def remove_stale(storage, category, keep):
+    """
+    Remove bundles of ``category`` other than ``keep`` whose successor has
+    been in place for ``RETENTION`` seconds, and abandoned ``.part`` files.
+    """
+    try:
+        files = storage.listdir(BUNDLE_DIR)[1]
+    except FileNotFoundError:
+        return
+    bundles = []
+    for filename in files:
+        path = f'{BUNDLE_DIR}/{filename}'
+        if not filename.startswith(f'{category}-'):
+            continue
+        try:
+            modified = storage.get_modified_time(path).timestamp()
+        except FileNotFoundError:
+            continue
+        bundles.append((modified, path))
+
+    cutoff = time.time() - RETENTION
+    bundles.sort()
+    for index, (modified, path) in enumerate(bundles):
+        if path == keep:
+            continue
+        if path.endswith(PART_SUFFIX):
+            stale = modified < cutoff
+        else:
+            # Replaced when the next newer bundle was written
+            successors = [other for other, other_path in bundles[index + 1:] if not other_path.endswith(PART_SUFFIX)]
+            stale = bool(successors) and successors[0] < cutoff
+        if stale:
+            storage.delete(path)
+
+
+def get_bundle(category, storage=None):
+    """
+    Return the stored name of the current bundle of ``category``, building
+    it first if the category changed. None when it has no documents.
+    """
+    storage = storage or Document._meta.get_field('file').storage
+    documents = bundle_documents(category)
+    if not documents:
+        return None
+    name = bundle_name(category, documents)
+    if not storage.exists(name):
+        write_bundle(storage, name, documents)
+        remove_stale(storage, category, name)
+    return name
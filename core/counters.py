@@ -0,0 +1,165 @@
+"""
+Per-year registry counters, materialized in ``YearlyStatistics``.
+
+Every ``Listener`` counts once for its certificate type (MO in
+``professional_development_count``, QT in ``retraining_count``) and every
+active ``StudentTrainingRecord`` once in ``student_record_count``. The year
+is the last four-digit year in ``duration``/``training_time`` (the end of
+the training period), or the year the row was created.
+
+Saves and deletes adjust the counters through signals (see ``signals``), the
+importers pass the deltas of each chunk to ``apply``, and ``rebuild`` (the
+``rebuild_yearly_statistics`` command) recounts everything for reconciliation.
+"""
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from . import fragments, page_cache
+from .import_normalization import normalize_record_type
+from .models import Listener, StudentTrainingRecord, YearlyStatistics
+
+
+STUDENT_RECORD = 'ST'
+
+# record type -> YearlyStatistics column
+COUNTER_FIELDS = {
+    'MO': 'professional_development_count',
+    'QT': 'retraining_count',
+    STUDENT_RECORD: 'student_record_count',
+}
+
+# Fields a counter key is computed from; saves touching none of them can't move a row
+KEY_FIELDS = {
+    Listener: {'record_type', 'duration'},
+    StudentTrainingRecord: {'training_time', 'is_active'},
+}
+
+_YEAR_RE = re.compile(r'(?<!\d)((?:19|20)\d{2})(?!\d)')
+
+
+def record_year(text, created_at):
+    years = _YEAR_RE.findall(text or '')
+    if years:
+        return years[-1]
+    if created_at is None:
+        return None
+    if timezone.is_aware(created_at):
+        created_at = timezone.localtime(created_at)
+    return str(created_at.year)
+
+
+def listener_key(record_type, duration, created_at):
+    return record_year(duration, created_at), normalize_record_type(record_type)
+
+
+def student_key(training_time, is_active, created_at):
+    if not is_active:
+        return None
+    return record_year(training_time, created_at), STUDENT_RECORD
+
+
+def instance_key(instance):
+    """Counter key ``(year, record type)`` of a Listener/StudentTrainingRecord, or None."""
+    if isinstance(instance, Listener):
+        return listener_key(instance.record_type, instance.duration, instance.created_at)
+    return student_key(instance.training_time, instance.is_active, instance.created_at)
+
+
+def stored_key(model, pk):
+    """Counter key of the row as it is in the database (None if it doesn't exist)."""
+    if model is Listener:
+        row = Listener.objects.filter(pk=pk).values_list('record_type', 'duration', 'created_at').first()
+        return listener_key(*row) if row else None
+    row = StudentTrainingRecord.objects.filter(pk=pk).values_list('training_time', 'is_active', 'created_at').first()
+    return student_key(*row) if row else None
+
+
+def _invalidate():
+    fragments.invalidate_for(YearlyStatistics)
+    page_cache.bump_version()
+
+
+def apply(deltas):
+    """Add ``{(year, record type): change}`` to the counters, one UPDATE per year."""
+    by_year = {}
+    for key, change in deltas.items():
+        if not key or key[0] is None or not change:
+            continue
+        year, record_type = key
+        changes = by_year.setdefault(year, {})
+        field = COUNTER_FIELDS[record_type]
+        changes[field] = changes.get(field, 0) + change
+    if not by_year:
+        return
+
+    now = timezone.now()
+    with transaction.atomic():
+        YearlyStatistics.objects.bulk_create(
+            [YearlyStatistics(year=year) for year in by_year],
+            ignore_conflicts=True,
+        )
+        for year, changes in by_year.items():
+            YearlyStatistics.objects.filter(year=year).update(
+                updated_at=now,
+                **{field: Greatest(F(field) + change, Value(0)) for field, change in changes.items() if change},
+            )
+    _invalidate()
+
+
+def move(old_key, new_key):
+    """Counter deltas for one row whose key changed from ``old_key`` to ``new_key``."""
+    deltas = Counter()
+    if old_key != new_key:
+        deltas[old_key] -= 1
+        deltas[new_key] += 1
+    return deltas
+
+
+def count_all(chunk_size=5000):
+    """Count every registry row from scratch; returns ``{(year, record type): count}``."""
+    counts = Counter()
+    listeners = Listener.objects.values_list('record_type', 'duration', 'created_at')
+    for row in listeners.iterator(chunk_size=chunk_size):
+        counts[listener_key(*row)] += 1
+    records = StudentTrainingRecord.objects.filter(is_active=True).values_list('training_time', 'created_at')
+    for training_time, created_at in records.iterator(chunk_size=chunk_size):
+        counts[(record_year(training_time, created_at), STUDENT_RECORD)] += 1
+    return counts
+
+
+def rebuild():
+    """
+    Replace every YearlyStatistics row with a fresh count; years without any
+    registry row are removed. Returns ``{year: {field: count}}``.
+    """
+    rows = {}
+    for (year, record_type), count in count_all().items():
+        if year is None:
+            continue
+        rows.setdefault(year, dict.fromkeys(COUNTER_FIELDS.values(), 0))[COUNTER_FIELDS[record_type]] = count
+
+    now = timezone.now()
+    with transaction.atomic():
+        YearlyStatistics.objects.exclude(year__in=list(rows)).delete()
+        existing = YearlyStatistics.objects.select_for_update().in_bulk(list(rows), field_name='year')
+        changed = []
+        for year, counts in rows.items():
+            obj = existing.get(year)
+            if obj is None:
+                continue
+            if any(getattr(obj, field) != value for field, value in counts.items()):
+                for field, value in counts.items():
+                    setattr(obj, field, value)
+                obj.updated_at = now
+                changed.append(obj)
+        YearlyStatistics.objects.bulk_update(changed, list(COUNTER_FIELDS.values()) + ['updated_at'])
+        YearlyStatistics.objects.bulk_create(
+            [YearlyStatistics(year=year, **counts) for year, counts in rows.items() if year not in existing]
+        )
+    _invalidate()
+    return rows
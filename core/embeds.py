@@ -0,0 +1,82 @@
+"""
+Video link parsing for InternationalVideo.
+
+Admins paste anything from a watch link to a whole ``<iframe>`` snippet;
+``parse_video`` reduces it to a YouTube video id and a canonical embed URL.
+It runs once when the video is saved, never while a page is rendered.
+"""
+import re
+
+from django.utils.html import format_html
+
+
+_IFRAME_SRC_RE = re.compile(r'src=["\']([^"\']+)["\']', re.IGNORECASE)
+
+# Longest id kept; matches InternationalVideo.video_id
+MAX_VIDEO_ID_LENGTH = 32
+
+_ID = rf'([A-Za-z0-9_-]{{6,{MAX_VIDEO_ID_LENGTH}}})(?![A-Za-z0-9_-])'
+
+# Tried in order; the first match wins
+_VIDEO_ID_RES = [
+    re.compile(rf'youtube(?:-nocookie)?\.com/embed/{_ID}', re.IGNORECASE),
+    re.compile(rf'youtu\.be/{_ID}', re.IGNORECASE),
+    re.compile(rf'[?&]v={_ID}', re.IGNORECASE),
+    re.compile(rf'youtube\.com/shorts/{_ID}', re.IGNORECASE),
+]
+_BARE_ID_RE = re.compile(r'[A-Za-z0-9_-]{11}')
+
+
+def parse_video(url):
+    """
+    Return ``(video_id, embed_url)`` for a pasted link or iframe snippet.
+
+    Links that aren't YouTube keep their (iframe src) value as the embed URL
+    and get an empty video id.
+    """
+    value = (url or '').strip()
+    if not value:
+        return '', ''
+
+    iframe_src = _IFRAME_SRC_RE.search(value)
+    if iframe_src:
+        value = iframe_src.group(1).strip()
+
+    value = value.replace('&amp;', '&')
+
+    for pattern in _VIDEO_ID_RES:
+        match = pattern.search(value)
+        if match:
+            return match.group(1), embed_url(match.group(1))
+
+    if _BARE_ID_RE.fullmatch(value):
+        return value, embed_url(value)
+
+    return '', value
+
+
+def embed_url(video_id):
+    return f'https://www.youtube.com/embed/{video_id}'
+
+
+def thumbnail_url(video_id):
+    return f'https://i.ytimg.com/vi/{video_id}/hqdefault.jpg' if video_id else ''
+
+
+FACADE_STYLE = (
+    '*{margin:0;padding:0;overflow:hidden}html,body{height:100%;background:#0f172a}'
+    'img,span{position:absolute;inset:0;margin:auto}img{width:100%;height:100%;object-fit:cover}'
+    'span{height:1.5em;text-align:center;font:48px/1.5 sans-serif;color:#fff;text-shadow:0 0 .5em #000}'
+)
+
+
+def facade_srcdoc(embed, thumbnail, title):
+    """
+    Inner document of a click-to-play iframe: the thumbnail linking to the
+    player. Its values are escaped here; the template escapes the whole
+    document once more for the ``srcdoc`` attribute.
+    """
+    return format_html(
+        '<style>{}</style><a href="{}?autoplay=1"><img src="{}" alt="{}" loading="lazy"><span>&#9654;</span></a>',
+        FACADE_STYLE, embed, thumbnail, title,
+    )
@@ -0,0 +1,103 @@
+"""
+Streaming exports for the certificate registry.
+Rows are read with ``values_list().iterator()`` and written out one by one,
+so memory use does not grow with the size of the table.
+"""
+import csv
+import json
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+from .models import Listener
+
+
+CHUNK_SIZE = 2000
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Spooled file stays in memory up to this size, then moves to disk
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# (model field, column header)
+LISTENER_EXPORT_COLUMNS = [
+    ('full_name', 'F.I.SH'),
+    ('workplace', 'Ish joyi'),
+    ('course_type', 'Yo\'nalish'),
+    ('series', 'Seriya'),
+    ('number', 'Raqam'),
+    ('duration', "O'qish muddati (davri)"),
+    ('record_type', 'Turi'),
+]
+
+
+def listener_rows(record_type=None):
+    """Yield export rows as tuples, with the record type shown by its label."""
+    queryset = Listener.objects.all()
+    if record_type:
+        queryset = queryset.filter(record_type=record_type)
+    type_labels = dict(Listener.RECORD_TYPE_CHOICES)
+    fields = [field for field, _ in LISTENER_EXPORT_COLUMNS]
+    type_index = fields.index('record_type')
+    for row in queryset.values_list(*fields).iterator(chunk_size=CHUNK_SIZE):
+        row = list(row)
+        row[type_index] = type_labels.get(row[type_index], row[type_index])
+        yield row
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def xlsx_response(rows, headers, filename):
+    """Write rows through a write-only workbook into a spooled temp file."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+def csv_response(rows, headers, filename):
+    writer = csv.writer(Echo())
+
+    def stream():
+        # BOM so Excel opens the UTF-8 file with the right encoding
+        yield '\ufeff'
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def ndjson_response(rows, keys, filename):
+    def stream():
+        for row in rows:
+            yield json.dumps(dict(zip(keys, row)), ensure_ascii=False) + '\n'
+
+    response = StreamingHttpResponse(stream(), content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_listeners(record_type=None, export_format='xlsx'):
+    """Build the export response for ``xlsx`` (default), ``csv`` or ``ndjson``."""
+    basename = f"tinglovchilar_{record_type or 'all'}"
+    rows = listener_rows(record_type)
+    if export_format == 'csv':
+        return csv_response(rows, [header for _, header in LISTENER_EXPORT_COLUMNS], f"{basename}.csv")
+    if export_format == 'ndjson':
+        return ndjson_response(rows, [field for field, _ in LISTENER_EXPORT_COLUMNS], f"{basename}.ndjson")
+    return xlsx_response(rows, [header for _, header in LISTENER_EXPORT_COLUMNS], f"{basename}.xlsx")
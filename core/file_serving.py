@@ -0,0 +1,166 @@
+"""
+Serving of stored media files (journal PDFs, documents) from a view.
+
+Supports single ``Range`` requests with ``If-Range``, strong ETags,
+``If-None-Match``/``If-Modified-Since`` and long-lived ``Cache-Control``.
+With ``MEDIA_SENDFILE_BACKEND`` set, the body is left to the front server
+(``X-Accel-Redirect`` for nginx, ``X-Sendfile`` for Apache/lighttpd), which
+then handles ranges itself.
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+from .storage import ContentAddressedStorage
+
+
+CACHE_MAX_AGE = getattr(settings, 'MEDIA_FILE_CACHE_MAX_AGE', 60 * 60 * 24 * 30)
+SENDFILE_BACKEND = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+ACCEL_REDIRECT_PREFIX = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def file_etag(name, size, modified):
+    """Strong validator: a stored name plus its size and mtime identifies the bytes."""
+    if ContentAddressedStorage.is_content_addressed(name):
+        # The name already is the content hash
+        value = os.path.splitext(os.path.basename(name))[0]
+    else:
+        value = hashlib.sha1(f'{name}:{size}:{modified.timestamp()}'.encode('utf-8')).hexdigest()
+    return quote_etag(value)
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single-range ``Range`` header,
+    None to serve the whole file, or ``'unsatisfiable'``.
+    """
+    match = _RANGE_RE.match((header or '').strip())
+    if not match or not any(match.groups()):
+        # Missing, malformed or multi-range: answer with the full file
+        return None
+    first, last = match.groups()
+    if size == 0:
+        # No byte of an empty file can be addressed
+        return 'unsatisfiable'
+    if not first:
+        # bytes=-N: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'unsatisfiable'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'unsatisfiable'
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    value = request.headers.get('If-Range')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        # Weak validators never match If-Range
+        return value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and int(last_modified.timestamp()) == date
+
+
+def _read_range(handle, start, length):
+    try:
+        handle.seek(start)
+        while length > 0:
+            chunk = handle.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        handle.close()
+
+
+def _sendfile_header(storage, name):
+    """``(header, value)`` handing ``name`` to the front server, or None to stream it here."""
+    if SENDFILE_BACKEND == 'x-accel-redirect':
+        # Header values are Latin-1; Cyrillic names and spaces must be URL-quoted
+        return 'X-Accel-Redirect', ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(name)
+    if SENDFILE_BACKEND:
+        try:
+            return 'X-Sendfile', storage.path(name)
+        except NotImplementedError:
+            # Not on the local disk: the front server can't read it either
+            return None
+    return None
+
+
+def serve_file(request, file, filename=None):
+    """Serve a FieldFile with conditional, range and cache headers."""
+    if not file:
+        raise Http404("Fayl topilmadi")
+    storage, name = file.storage, file.name
+    try:
+        size = storage.size(name)
+        modified = storage.get_modified_time(name)
+    except (FileNotFoundError, OSError):
+        raise Http404("Fayl topilmadi")
+
+    etag = file_etag(name, size, modified)
+    last_modified = int(modified.timestamp())
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    filename = filename or os.path.basename(name)
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['Accept-Ranges'] = 'bytes'
+        max_age = 60 * 60 * 24 * 365 if ContentAddressedStorage.is_content_addressed(name) else CACHE_MAX_AGE
+        immutable = ', immutable' if ContentAddressedStorage.is_content_addressed(name) else ''
+        response['Cache-Control'] = f'public, max-age={max_age}{immutable}'
+        return response
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        return finish(conditional)
+
+    sendfile_header = _sendfile_header(storage, name)
+    if sendfile_header:
+        response = HttpResponse(content_type=content_type)
+        response[sendfile_header[0]] = sendfile_header[1]
+        response['Content-Disposition'] = content_disposition_header(False, filename)
+        return finish(response)
+
+    byte_range = None
+    if request.method == 'GET' and _if_range_matches(request, etag, modified):
+        byte_range = parse_range(request.headers.get('Range'), size)
+
+    if byte_range == 'unsatisfiable':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return finish(response)
+
+    if byte_range is None:
+        response = FileResponse(storage.open(name, 'rb'), content_type=content_type, filename=filename)
+        return finish(response)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _read_range(storage.open(name, 'rb'), start, length),
+        status=206,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Disposition'] = content_disposition_header(False, filename)
+    return finish(response)
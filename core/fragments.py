@@ -0,0 +1,79 @@
+"""
+Per-section cache for the home page.
+
+Each section (news, teachers, courses, ...) caches the data it renders under
+its own key. Saving or deleting one of the section's source models drops only
+that key, so a news edit keeps the gallery cached. Only plain cache get/set/
+delete calls are used, so any backend works, but with several worker
+processes ``HOME_SECTION_CACHE_ALIAS`` must name a cache they all share
+(file-based here); a local-memory cache is only invalidated in the process
+that saw the write.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import (
+    ArtGalleryImage,
+    ArtGalleryItem,
+    Course,
+    GalleryImage,
+    GalleryItem,
+    News,
+    NewsImage,
+    Statistics,
+    Teacher,
+    YearlyStatistics,
+)
+
+
+# section -> models whose writes invalidate it
+SECTION_MODELS = {
+    'news': [News, NewsImage],
+    'teachers': [Teacher],
+    'courses': [Course],
+    'gallery': [GalleryItem, GalleryImage],
+    'art_gallery': [ArtGalleryItem, ArtGalleryImage],
+    'stats': [Statistics, YearlyStatistics],
+}
+
+CACHE_ALIAS = getattr(settings, 'HOME_SECTION_CACHE_ALIAS', 'default')
+CACHE_TIMEOUT = getattr(settings, 'HOME_SECTION_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def section_key(name):
+    return f'home:section:{name}'
+
+
+def get_section(name, build):
+    """Return the cached data of section ``name``, building and storing it on a miss."""
+    cache = _cache()
+    key = section_key(name)
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
+
+
+def sections_for(model):
+    return [name for name, models in SECTION_MODELS.items() if model in models]
+
+
+def invalidate(*names):
+    if names:
+        _cache().delete_many([section_key(name) for name in names])
+
+
+def invalidate_for(model):
+    """
+    Drop the sections built from ``model`` once the current transaction
+    commits, so a concurrent request can't cache the pre-commit rows again.
+    """
+    names = sections_for(model)
+    if names:
+        transaction.on_commit(lambda: invalidate(*names))
@@ -0,0 +1,371 @@
+"""
+Responsive image derivatives.
+
+``ResponsiveImageField`` is a drop-in ``ImageField`` that, once the upload
+is stored, writes resized WebP and JPEG copies of it at ``IMAGE_DERIVATIVE_WIDTHS``
+under ``derivatives/<original path without extension>/``, followed by a
+``manifest.json`` recording the source hash, mtime and widths. The manifest
+is written last, so it marks a complete set. Derivatives are only rendered
+when a new file is uploaded and by the ``backfill_image_derivatives``
+command; either one records the finished set in the field's
+``derivatives_field``, so pages know which images have derivatives without
+asking the storage. The field file exposes ``srcset`` strings for templates
+(see the ``responsive_image`` tag). Images without derivatives (not yet
+backfilled, or unreadable) fall back to the original URL. When a row's image
+is replaced, cleared or deleted, the old set is removed after the commit
+(see ``signals``).
+
+Before a new upload is stored it is also normalized: EXIF orientation is
+applied, the image is capped at ``IMAGE_UPLOAD_MAX_DIMENSION``, metadata is
+dropped and it is re-encoded at ``IMAGE_UPLOAD_QUALITY``. The resulting size
+is kept in the field's ``width_field``/``height_field``.
+"""
+import hashlib
+import json
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models
+from django.db.models.fields.files import ImageFieldFile
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = tuple(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 1280)))
+
+DERIVATIVE_DIR = 'derivatives'
+
+MAX_UPLOAD_DIMENSION = getattr(settings, 'IMAGE_UPLOAD_MAX_DIMENSION', 2560)
+UPLOAD_QUALITY = getattr(settings, 'IMAGE_UPLOAD_QUALITY', 85)
+
+# Pillow format -> save options for re-encoded uploads; other formats are stored untouched
+UPLOAD_FORMATS = {
+    'JPEG': {'format': 'JPEG', 'quality': UPLOAD_QUALITY, 'optimize': True, 'progressive': True},
+    'MPO': {'format': 'JPEG', 'quality': UPLOAD_QUALITY, 'optimize': True, 'progressive': True},
+    'PNG': {'format': 'PNG', 'optimize': True},
+    'WEBP': {'format': 'WEBP', 'quality': UPLOAD_QUALITY, 'method': 4},
+}
+
+# format -> (file extension, Pillow save options)
+FORMATS = {
+    'webp': ('webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# (storage class, name) pairs known to have derivatives; only hits are remembered
+_known = set()
+
+
+def _derivative_dir(name):
+    return f'{DERIVATIVE_DIR}/{os.path.splitext(name)[0]}'
+
+
+def derivative_name(name, width, fmt):
+    return f'{_derivative_dir(name)}/w{width}.{FORMATS[fmt][0]}'
+
+
+def manifest_name(name):
+    return f'{_derivative_dir(name)}/manifest.json'
+
+
+def has_derivatives(storage, name):
+    """True when a complete derivative set of ``name`` exists (cached per process)."""
+    if not name:
+        return False
+    key = (type(storage), name)
+    if key in _known:
+        return True
+    if storage.exists(manifest_name(name)):
+        _known.add(key)
+        return True
+    return False
+
+
+def read_manifest(storage, name):
+    try:
+        with storage.open(manifest_name(name), 'rb') as handle:
+            return json.loads(handle.read().decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+
+
+def source_mtime(storage, name):
+    try:
+        return storage.get_modified_time(name).timestamp()
+    except (NotImplementedError, OSError):
+        return None
+
+
+def _replace(storage, name, data):
+    # Keep the deterministic name; storage.save() would add a suffix
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(data))
+
+
+def _flatten(image):
+    """RGB copy of ``image`` for JPEG, with transparency composited on white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _open_upright(source):
+    """Open ``source`` with EXIF orientation applied, as RGB or RGBA."""
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    return image
+
+
+def render_derivatives(image, widths=WIDTHS):
+    """
+    Yield ``(width, fmt, bytes)`` for every derivative of ``image``.
+    Images are never upscaled.
+    """
+    for width in widths:
+        resized = image
+        if image.width > width:
+            height = max(round(image.height * width / image.width), 1)
+            resized = image.resize((width, height), Image.LANCZOS)
+        for fmt, (_, options) in FORMATS.items():
+            target = _flatten(resized) if fmt == 'jpeg' else resized
+            buffer = BytesIO()
+            target.save(buffer, **options)
+            yield width, fmt, buffer.getvalue()
+
+
+def render_source(source, widths=WIDTHS, known_hash=None):
+    """
+    Hash and render one image; returns ``(sha256, outputs, (width, height))``.
+    ``outputs`` and the size are None when the hash equals ``known_hash``
+    (the derivatives are current). Top-level and free of Django state so it
+    can run in a worker process.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        data = bytes(source)
+    else:
+        with open(source, 'rb') as handle:
+            data = handle.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == known_hash:
+        return digest, None, None
+    image = _open_upright(BytesIO(data))
+    return digest, list(render_derivatives(image, widths)), image.size
+
+
+def write_derivatives(storage, name, outputs, digest, size, widths=WIDTHS):
+    """Store rendered derivatives of ``name`` and then its manifest."""
+    for width, fmt, data in outputs:
+        _replace(storage, derivative_name(name, width, fmt), data)
+    write_manifest(storage, name, digest, size, widths)
+
+
+def write_manifest(storage, name, digest, size, widths=WIDTHS):
+    manifest = {
+        'source': name,
+        'sha256': digest,
+        'mtime': source_mtime(storage, name),
+        'width': size[0],
+        'height': size[1],
+        'widths': list(widths),
+        'formats': list(FORMATS),
+    }
+    _replace(storage, manifest_name(name), json.dumps(manifest).encode('utf-8'))
+    _known.add((type(storage), name))
+
+
+def delete_derivatives(storage, name):
+    """Remove the derivative set of ``name``, manifest first so it never looks complete."""
+    directory = _derivative_dir(name)
+    try:
+        _, files = storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        files = [os.path.basename(derivative_name(name, width, fmt)) for width in WIDTHS for fmt in FORMATS]
+    _known.discard((type(storage), name))
+    storage.delete(manifest_name(name))
+    for filename in files:
+        if filename != 'manifest.json':
+            storage.delete(f'{directory}/{filename}')
+    try:
+        os.rmdir(storage.path(directory))
+    except (NotImplementedError, OSError):
+        # Remote storages have no directories; a local one may not be empty
+        pass
+
+
+def is_current(manifest, storage, name, widths=WIDTHS):
+    """True when ``manifest`` matches the configured widths and the source mtime."""
+    return bool(
+        manifest
+        and manifest.get('widths') == list(widths)
+        and manifest.get('formats') == list(FORMATS)
+        and manifest.get('width')
+        and manifest.get('mtime') is not None
+        and manifest.get('mtime') == source_mtime(storage, name)
+    )
+
+
+def generate_derivatives(storage, name):
+    """Render and store every derivative of the stored image ``name``."""
+    with storage.open(name, 'rb') as source:
+        digest, outputs, size = render_source(source.read())
+    write_derivatives(storage, name, outputs, digest, size)
+
+
+def process_upload(file):
+    """
+    Return ``(content, (width, height))`` for an uploaded image after
+    orientation, downscaling and re-encoding without metadata, or None to
+    store the upload as it is (unknown format, animation, unreadable file).
+    """
+    file.seek(0)
+    try:
+        with Image.open(file) as original:
+            options = UPLOAD_FORMATS.get(original.format)
+            if options is None or getattr(original, 'is_animated', False):
+                return None
+            icc_profile = original.info.get('icc_profile')
+            image = ImageOps.exif_transpose(original)
+            image.load()
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+    finally:
+        file.seek(0)
+
+    image.thumbnail((MAX_UPLOAD_DIMENSION, MAX_UPLOAD_DIMENSION), Image.LANCZOS)
+    if options['format'] == 'JPEG' and image.mode != 'RGB':
+        image = _flatten(image)
+    options = dict(options)
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+
+    buffer = BytesIO()
+    # No exif= here, so EXIF (GPS, camera data, orientation) is not written
+    image.save(buffer, **options)
+    return ContentFile(buffer.getvalue()), image.size
+
+
+class ResponsiveImageFieldFile(ImageFieldFile):
+
+    @property
+    def has_derivatives(self):
+        if self.field.derivatives_field and self.instance is not None:
+            return bool(getattr(self.instance, self.field.derivatives_field, False))
+        return has_derivatives(self.storage, self.name)
+
+    @property
+    def stored_dimensions(self):
+        """``(width, height)`` from the model's dimension fields, without opening the file."""
+        if self.instance is None or not self.field.width_field or not self.field.height_field:
+            return None
+        width = getattr(self.instance, self.field.width_field, None)
+        height = getattr(self.instance, self.field.height_field, None)
+        return (width, height) if width and height else None
+
+    def srcset_widths(self):
+        """Derivative widths with their real sizes; widths past the original collapse into one."""
+        dimensions = self.stored_dimensions
+        if not dimensions:
+            return [(width, width) for width in WIDTHS]
+        entries = []
+        for width in WIDTHS:
+            entries.append((width, min(width, dimensions[0])))
+            if width >= dimensions[0]:
+                break
+        return entries
+
+    def derivative_url(self, width, fmt='jpeg'):
+        return self.storage.url(derivative_name(self.name, width, fmt))
+
+    def srcset(self, fmt):
+        if not self.has_derivatives:
+            return ''
+        return ', '.join(
+            f'{self.derivative_url(width, fmt)} {actual}w' for width, actual in self.srcset_widths()
+        )
+
+    @property
+    def srcset_webp(self):
+        return self.srcset('webp')
+
+    @property
+    def srcset_jpeg(self):
+        return self.srcset('jpeg')
+
+    @property
+    def fallback_url(self):
+        """Mid-size JPEG for ``<img src>``, or the original when there are no derivatives."""
+        if self.has_derivatives:
+            return self.derivative_url(WIDTHS[len(WIDTHS) // 2], 'jpeg')
+        return self.url
+
+    @property
+    def display_url(self):
+        """Largest WebP derivative for full-size viewers (lightboxes), or the original."""
+        if self.has_derivatives:
+            return self.derivative_url(WIDTHS[-1], 'webp')
+        return self.url
+
+
+class ResponsiveImageField(models.ImageField):
+    """
+    ImageField that normalizes new uploads before they are stored and then
+    renders their WebP/JPEG derivatives.
+    """
+
+    attr_class = ResponsiveImageFieldFile
+
+    def __init__(self, *args, derivatives_field=None, **kwargs):
+        # Boolean field set once the derivatives of the current file are stored
+        self.derivatives_field = derivatives_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.derivatives_field:
+            kwargs['derivatives_field'] = self.derivatives_field
+        return name, path, args, kwargs
+
+    def update_dimension_fields(self, instance, force=False, *args, **kwargs):
+        # Django fills empty dimension fields on every model load by opening
+        # the file; here they are only set on upload and by the backfill command
+        if force:
+            super().update_dimension_fields(instance, force=True, *args, **kwargs)
+
+    def pre_save(self, model_instance, add):
+        file = getattr(model_instance, self.attname)
+        uploading = bool(file) and not file._committed
+        if uploading:
+            processed = process_upload(file)
+            if processed is not None:
+                content, (width, height) = processed
+                file.file = content
+                if self.width_field:
+                    setattr(model_instance, self.width_field, width)
+                if self.height_field:
+                    setattr(model_instance, self.height_field, height)
+        file = super().pre_save(model_instance, add)
+        # Saves that keep the stored file never render; the backfill command covers older files
+        if uploading:
+            rendered = False
+            try:
+                generate_derivatives(file.storage, file.name)
+                rendered = True
+            except (OSError, ValueError, Image.DecompressionBombError):
+                # The original is still served; the backfill command can retry
+                logger.warning("Could not create derivatives for %s", file.name, exc_info=True)
+            if self.derivatives_field:
+                setattr(model_instance, self.derivatives_field, rendered)
+        elif not file and self.derivatives_field:
+            setattr(model_instance, self.derivatives_field, False)
+        return file
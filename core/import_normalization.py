@@ -0,0 +1,174 @@
+"""
+Column mapping and row normalization shared by the Excel/CSV imports.
+The header mapping is resolved once per file; every cleanup step then runs as a
+whole-column pandas operation on each chunk, before any ORM work.
+"""
+import pandas as pd
+
+from .models import StudentTrainingRecord, hash_natural_key
+from .transliteration import search_text
+
+
+# Flexible column mapping - supports both MO and QT formats
+LISTENER_COLUMNS = {
+    'full_name': ['Tinglovchi', 'F.I.SH', 'FIO', 'Ism', 'Ismi', 'F.I.O', 'Familiya'],
+    'workplace': ['Asosiy ish joyi', 'Ish joyi', 'Lavozimi', 'Tashkilot', 'Muassasa',
+                  'Ta\'lim muassasasi', 'Qayta tayyorlagan muassasa'],
+    'course_type': ['Kursi', 'Kurs', 'Yo\'nalishi', 'Yo\'nalish',
+                    'Qayta tayyorlash kursi', 'Kurs nomi'],
+    'series': ['Seriyasi', 'Seriya', 'Sertifikat seriyasi', 'Diplom seriyasi'],
+    'number': ['Raqami', 'Raqam', '№', 'Sertifikat raqami', 'Diplom raqami'],
+    'duration': ["O'qish muddati (davri)", "O'qish muddati", 'Muddat', 'Davri',
+                 'Kurs davri', 'Boshlanish - tugash'],
+}
+
+STUDENT_RECORD_COLUMNS = {
+    'full_name': ['F.I.SH', 'FIO', 'F.I.O', 'Tinglovchi', 'Ism familiya'],
+    'workplace': ['Asosiy ish joyi', 'Ish joyi', 'Tashkilot', 'Muassasa'],
+    'course_name': ['Malaka oshirish yo\'nalishi', 'Malaka oshirish yonalishi', 'Yo\'nalish', 'Kurs', 'Kursi'],
+    'training_time': ['Malaka oshirish vaqti', 'O\'qish muddati', 'Muddat', 'Vaqt', 'Oy'],
+}
+
+LISTENER_FIELDS = ['record_type', 'full_name', 'workplace', 'course_type', 'series', 'number', 'duration']
+STUDENT_RECORD_FIELDS = ['full_name', 'workplace', 'course_name', 'training_time']
+
+# Floats beyond this can't be printed as exact integers
+_MAX_EXACT_INT = 2 ** 53
+
+
+def normalize_record_type(value):
+    """Same rule as Listener.save(): uppercase, anything unknown becomes MO."""
+    value = str(value or '').strip().upper()
+    return value if value in ('MO', 'QT') else 'MO'
+
+
+def find_column(possible_names, columns):
+    """Find matching column (case-insensitive with partial match)."""
+    columns_lower = {col.lower().strip(): col for col in columns if col}
+    for name in possible_names:
+        name_lower = name.lower().strip()
+        if name_lower in columns_lower:
+            return columns_lower[name_lower]
+        # Partial match
+        for col_lower, col_orig in columns_lower.items():
+            if name_lower in col_lower or col_lower in name_lower:
+                return col_orig
+    return None
+
+
+def resolve_columns(headers, column_mapping):
+    """Build ``{column_index: model_field}`` for the sheet headers."""
+    actual_mapping = {}
+    for model_field, possible_names in column_mapping.items():
+        found_col = find_column(possible_names, headers)
+        if found_col:
+            actual_mapping[headers.index(found_col)] = model_field
+    return actual_mapping
+
+
+def clean_text(column):
+    """Stringify, strip and turn empty cells into NaN for a whole column."""
+    column = column.astype(object)
+    missing = column.isna()
+
+    floats = column.map(type, na_action='ignore').eq(float)
+    if floats.any():
+        # Excel numeric cells come back as floats; pandas' dtype=str printed 831.0 as "831"
+        values = column[floats].astype(float)
+        whole = values[(values == values.round()) & (values.abs() < _MAX_EXACT_INT)]
+        column = column.copy()
+        column[whole.index] = whole.astype('int64').astype(str)
+
+    text = column.astype(str).str.strip()
+    return text.mask(missing | text.eq(''))
+
+
+def build_frame(raw_rows, mapping, first_row=0):
+    """
+    Build a DataFrame of mapped model fields from a chunk of raw row tuples.
+
+    Blank lines are dropped. ``_row`` keeps the 0-based data row index in the
+    file (used for auto-numbering), counted from ``first_row``.
+    """
+    raw = pd.DataFrame.from_records(raw_rows) if raw_rows else pd.DataFrame()
+    raw.index = pd.RangeIndex(first_row, first_row + len(raw))
+    if raw.empty:
+        return pd.DataFrame(columns=['_row'] + list(mapping.values()))
+
+    blank = raw.isna() | raw.eq('')
+    raw = raw[~blank.all(axis=1)]
+
+    frame = pd.DataFrame(index=raw.index)
+    for col, field in mapping.items():
+        if col in raw.columns:
+            frame[field] = clean_text(raw[col])
+        else:
+            frame[field] = pd.Series(None, index=raw.index, dtype=object)
+    frame['_row'] = raw.index
+    return frame
+
+
+def normalize_listener_frame(frame, record_type):
+    """
+    Apply the Listener.save() rules to a whole chunk.
+
+    Returns ``(frame, skipped, repeats)``: rows without a name are dropped and
+    counted as skipped; repeated numbers are merged (later non-empty cells win)
+    and counted as repeats. The result is indexed by certificate number.
+    """
+    record_type = normalize_record_type(record_type)
+    for field in LISTENER_FIELDS:
+        if field not in frame.columns:
+            frame[field] = pd.Series(None, index=frame.index, dtype=object)
+
+    has_name = frame['full_name'].notna()
+    skipped = int((~has_name).sum())
+    frame = frame[has_name]
+
+    # Listener.save() always forces series to the record type
+    frame = frame.assign(record_type=record_type, series=record_type)
+    # Auto-generate number if missing
+    auto_numbers = (frame['_row'] + 1).astype(str).str.zfill(6)
+    frame['number'] = frame['number'].fillna(auto_numbers)
+
+    merged = frame[LISTENER_FIELDS].groupby('number', sort=False).last()
+    repeats = len(frame) - len(merged)
+    return merged, skipped, repeats
+
+
+def normalize_student_frame(frame):
+    """
+    Clean a StudentTrainingRecord chunk.
+
+    Returns ``(frame, skipped)``; missing optional cells become empty strings
+    and every row gets its ``natural_key`` hash and ``search_text``.
+    """
+    for field in STUDENT_RECORD_FIELDS:
+        if field not in frame.columns:
+            frame[field] = pd.Series(None, index=frame.index, dtype=object)
+
+    has_name = frame['full_name'].notna()
+    skipped = int((~has_name).sum())
+    frame = frame.loc[has_name, STUDENT_RECORD_FIELDS].fillna('')
+    frame['natural_key'] = natural_keys(frame, ['full_name', 'workplace', 'course_name'])
+    frame['search_text'] = [
+        search_text(*values)
+        for values in zip(*(frame[field] for field in StudentTrainingRecord.SEARCH_TEXT_FIELDS))
+    ]
+    return frame, skipped
+
+
+def natural_keys(frame, fields):
+    """
+    Vectorized counterpart of models.student_record_key for a whole chunk.
+    Must normalize exactly like models.normalize_key_part.
+    """
+    parts = [
+        frame[field].astype(str).str.replace(r'\s+', ' ', regex=True).str.strip().str.casefold()
+        for field in fields
+    ]
+    return pd.Series(
+        [hash_natural_key(*values) for values in zip(*parts)],
+        index=frame.index,
+        dtype=object,
+    )
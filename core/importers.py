@@ -0,0 +1,449 @@
+"""
+Bulk import helpers for Excel uploads.
+Files are streamed row by row and written in bounded, batched transactions.
+Imports run as ImportJob rows processed by the ``run_import_worker`` command.
+"""
+import csv
+import io
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from .import_normalization import (
+    LISTENER_COLUMNS,
+    LISTENER_FIELDS,
+    STUDENT_RECORD_COLUMNS,
+    build_frame,
+    normalize_listener_frame,
+    normalize_record_type,
+    normalize_student_frame,
+    resolve_columns,
+)
+from . import counters, search
+from .models import ImportJob, Listener, StudentTrainingRecord, student_record_key
+from .storage import ContentAddressedStorage
+
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 5000
+
+# A running job saves its progress after every chunk; one silent for this
+# many seconds has lost its worker (killed, crashed or redeployed)
+STALE_JOB_TIMEOUT = getattr(settings, 'IMPORT_JOB_STALE_TIMEOUT', 60 * 30)
+
+
+def new_counts():
+    return {'created': 0, 'updated': 0, 'skipped': 0}
+
+
+def cell_to_str(value):
+    """Convert a header cell to a stripped string, or None."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, datetime):
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+    elif isinstance(value, date):
+        value = value.isoformat()
+    value = str(value).strip()
+    return value or None
+
+
+def _source(uploaded_file):
+    """Prefer a file on disk (upload temp file or local storage) over an open stream."""
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        return uploaded_file.temporary_file_path()
+    try:
+        return uploaded_file.path
+    except (AttributeError, NotImplementedError):
+        pass
+    if getattr(uploaded_file, 'closed', False):
+        uploaded_file.open('rb')
+    uploaded_file.seek(0)
+    return uploaded_file
+
+
+@contextmanager
+def open_sheet(uploaded_file):
+    """
+    Open an uploaded .xlsx/.csv file for streaming.
+
+    Yields ``(headers, rows)`` where ``rows`` lazily produces one tuple of raw
+    cell values per data row. Nothing beyond the current row is held in memory;
+    cleanup happens per chunk in ``import_normalization``.
+    """
+    source = _source(uploaded_file)
+
+    if uploaded_file.name.lower().endswith('.csv'):
+        from_path = isinstance(source, str)
+        if from_path:
+            handle = open(source, encoding='utf-8-sig', newline='')
+        else:
+            handle = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+        try:
+            reader = csv.reader(handle)
+            headers = [cell_to_str(h) or '' for h in next(reader, [])]
+            rows = iter(reader)
+            yield headers, rows
+        finally:
+            if from_path:
+                handle.close()
+            else:
+                # Leave the upload itself open, Django closes it
+                handle.detach()
+        return
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        values = sheet.iter_rows(values_only=True)
+        headers = [cell_to_str(h) or '' for h in next(values, ())]
+        yield headers, values
+    finally:
+        workbook.close()
+
+
+def estimate_rows(uploaded_file):
+    """Cheap data row count for progress display, or None if unknown."""
+    source = _source(uploaded_file)
+    if uploaded_file.name.lower().endswith('.csv'):
+        if not isinstance(source, str):
+            return None
+        lines = 0
+        with open(source, 'rb') as handle:
+            for block in iter(lambda: handle.read(1024 * 1024), b''):
+                lines += block.count(b'\n')
+        return max(lines - 1, 0)
+
+    # The sheet dimension is stored in the workbook header, no rows are parsed
+    workbook = load_workbook(source, read_only=True)
+    try:
+        max_row = workbook.active.max_row
+    finally:
+        workbook.close()
+    return max(max_row - 1, 0) if max_row else None
+
+
+def iter_frames(rows, mapping, chunk_size=CHUNK_SIZE):
+    """Group raw rows into chunks and yield each one as a mapped DataFrame."""
+    chunk = []
+    first_row = 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield build_frame(chunk, mapping, first_row)
+            first_row += len(chunk)
+            chunk = []
+    if chunk:
+        yield build_frame(chunk, mapping, first_row)
+
+
+def _present(record):
+    """Drop empty cells so they don't overwrite existing values."""
+    return {field: value for field, value in record.items() if not pd.isna(value)}
+
+
+class ListenerImporter:
+    """
+    Create or update listeners chunk by chunk.
+
+    Existing numbers for the series are loaded once; each chunk is written in
+    its own transaction with batched bulk_create/bulk_update.
+    """
+
+    def __init__(self, record_type, batch_size=BATCH_SIZE):
+        self.record_type = normalize_record_type(record_type)
+        self.batch_size = batch_size
+        self.counts = new_counts()
+        self._existing = None
+
+    def _load_existing(self):
+        self._existing = dict(
+            Listener.objects.filter(series=self.record_type).values_list('number', 'pk')
+        )
+
+    def import_frame(self, frame):
+        """Import one chunk produced by ``iter_frames`` and update ``self.counts``."""
+        counts = self.counts
+        merged, skipped, repeats = normalize_listener_frame(frame, self.record_type)
+        counts['skipped'] += skipped
+        # A repeated number inside the chunk counts as an update, as it did row by row
+        counts['updated'] += repeats
+        if merged.empty:
+            return counts
+
+        if self._existing is None:
+            self._load_existing()
+
+        pks = merged.index.map(self._existing)
+        is_new = pks.isna()
+        to_create = [
+            Listener(number=number, **_present(record))
+            for number, record in merged[is_new].to_dict('index').items()
+        ]
+        for obj in to_create:
+            obj.search_text = obj.build_search_text()
+        update_data = {
+            int(pk): dict(_present(record), number=number)
+            for pk, (number, record) in zip(pks[~is_new], merged[~is_new].to_dict('index').items())
+        }
+
+        # Yearly counter changes of this chunk, written in the same transaction
+        deltas = Counter()
+        with transaction.atomic():
+            if to_create:
+                Listener.objects.bulk_create(to_create, batch_size=self.batch_size)
+                deltas.update(counters.instance_key(obj) for obj in to_create)
+
+            now = timezone.now()
+            pk_list = list(update_data)
+            for start in range(0, len(pk_list), self.batch_size):
+                batch = Listener.objects.in_bulk(pk_list[start:start + self.batch_size])
+                for pk, obj in batch.items():
+                    old_key = counters.instance_key(obj)
+                    for field, value in update_data[pk].items():
+                        setattr(obj, field, value)
+                    obj.search_text = obj.build_search_text()
+                    obj.updated_at = now
+                    deltas.update(counters.move(old_key, counters.instance_key(obj)))
+                Listener.objects.bulk_update(
+                    batch.values(),
+                    fields=LISTENER_FIELDS + ['search_text', 'updated_at'],
+                    batch_size=self.batch_size,
+                )
+            counters.apply(deltas)
+
+        # Remember new keys so later chunks update instead of re-inserting
+        if any(obj.pk is None for obj in to_create):
+            self._load_existing()
+        else:
+            self._existing.update((obj.number, obj.pk) for obj in to_create)
+        search.index_objects(Listener, [self._existing[obj.number] for obj in to_create] + pk_list)
+
+        counts['created'] += len(to_create)
+        counts['updated'] += len(update_data)
+        return counts
+
+
+class StudentRecordImporter:
+    """
+    Create or update StudentTrainingRecord rows by their natural key hash.
+
+    Existing keys are loaded once; each chunk is written in one transaction
+    with batched bulk_create/bulk_update.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.counts = new_counts()
+        self._existing = None
+
+    def _backfill_keys(self):
+        """Hash rows saved before natural_key existed, so they can be matched."""
+        missing = StudentTrainingRecord.objects.filter(natural_key='').only(
+            'pk', 'full_name', 'workplace', 'course_name'
+        )
+        batch = []
+        for obj in missing.iterator(chunk_size=self.batch_size):
+            obj.natural_key = student_record_key(obj.full_name, obj.workplace, obj.course_name)
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                StudentTrainingRecord.objects.bulk_update(batch, ['natural_key'])
+                batch = []
+        if batch:
+            StudentTrainingRecord.objects.bulk_update(batch, ['natural_key'])
+
+    def _load_existing(self):
+        self._existing = {
+            key: (pk, training_time, is_active)
+            for key, pk, training_time, is_active in StudentTrainingRecord.objects.values_list(
+                'natural_key', 'pk', 'training_time', 'is_active'
+            )
+        }
+
+    def _counter_deltas(self, created, moved):
+        """Yearly counter changes for new rows and rows whose time or status changed."""
+        deltas = Counter(counters.instance_key(obj) for obj in created)
+        pks = list(moved)
+        for start in range(0, len(pks), self.batch_size):
+            # created_at decides the year of rows whose training_time has none
+            created_at = dict(
+                StudentTrainingRecord.objects.filter(pk__in=pks[start:start + self.batch_size])
+                .values_list('pk', 'created_at')
+            )
+            for pk, timestamp in created_at.items():
+                old_time, old_active, new_time = moved[pk]
+                deltas.update(counters.move(
+                    counters.student_key(old_time, old_active, timestamp),
+                    counters.student_key(new_time, True, timestamp),
+                ))
+        return deltas
+
+    def import_frame(self, frame):
+        counts = self.counts
+        frame, skipped = normalize_student_frame(frame)
+        counts['skipped'] += skipped
+        if frame.empty:
+            return counts
+
+        # Same key twice in a chunk: the last row wins, the repeat counts as an update
+        deduped = frame.drop_duplicates('natural_key', keep='last')
+        counts['updated'] += len(frame) - len(deduped)
+
+        if self._existing is None:
+            with transaction.atomic():
+                self._backfill_keys()
+            self._load_existing()
+
+        to_create = []
+        # training_time -> pks; rows that already match are counted but not rewritten
+        changed = {}
+        # pk -> (old training_time, old is_active, new training_time) for the yearly counters
+        moved = {}
+        matched = 0
+        for record in deduped.to_dict('records'):
+            current = self._existing.get(record['natural_key'])
+            if current is None:
+                to_create.append(StudentTrainingRecord(is_active=True, **record))
+                continue
+            matched += 1
+            pk, training_time, is_active = current
+            if training_time != record['training_time'] or not is_active:
+                changed.setdefault(record['training_time'], []).append(pk)
+                moved[pk] = (training_time, is_active, record['training_time'])
+                self._existing[record['natural_key']] = (pk, record['training_time'], True)
+
+        with transaction.atomic():
+            if to_create:
+                StudentTrainingRecord.objects.bulk_create(to_create, batch_size=self.batch_size)
+            now = timezone.now()
+            # One UPDATE per distinct value instead of a per-row CASE expression
+            for training_time, pks in changed.items():
+                for start in range(0, len(pks), self.batch_size):
+                    StudentTrainingRecord.objects.filter(pk__in=pks[start:start + self.batch_size]).update(
+                        training_time=training_time,
+                        is_active=True,
+                        updated_at=now,
+                    )
+            counters.apply(self._counter_deltas(to_create, moved))
+
+        # Remember new keys so later chunks update instead of re-inserting
+        if any(obj.pk is None for obj in to_create):
+            self._load_existing()
+        else:
+            self._existing.update(
+                (obj.natural_key, (obj.pk, obj.training_time, True)) for obj in to_create
+            )
+        search.index_objects(
+            StudentTrainingRecord,
+            [self._existing[obj.natural_key][0] for obj in to_create]
+            + [pk for pks in changed.values() for pk in pks],
+        )
+
+        counts['created'] += len(to_create)
+        counts['updated'] += matched
+        return counts
+
+
+def remove_upload(name, storage):
+    """Delete the uploaded sheet of a job that won't be read again."""
+    if name:
+        storage.delete(name)
+
+
+def reap_stale_jobs():
+    """
+    Mark running jobs without progress for ``STALE_JOB_TIMEOUT`` seconds as
+    failed and delete their uploads. Rows of the chunks they committed stay.
+    """
+    now = timezone.now()
+    stale = ImportJob.objects.filter(
+        status=ImportJob.STATUS_RUNNING,
+        updated_at__lt=now - timedelta(seconds=STALE_JOB_TIMEOUT),
+    )
+    storage = ImportJob._meta.get_field('file').storage
+    reaped = 0
+    for job_id, name, updated_at in stale.values_list('pk', 'file', 'updated_at'):
+        # Matching updated_at skips a job whose worker saved progress meanwhile
+        failed = ImportJob.objects.filter(
+            pk=job_id, status=ImportJob.STATUS_RUNNING, updated_at=updated_at,
+        ).update(
+            status=ImportJob.STATUS_FAILED,
+            error=f"Worker to'xtab qoldi: {STALE_JOB_TIMEOUT // 60} daqiqa davomida jarayon yangilanmadi.",
+            file='',
+            finished_at=now,
+            updated_at=now,
+        )
+        if failed:
+            remove_upload(name, storage)
+            reaped += 1
+    return reaped
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest queued job to running; safe with several
+    workers. Jobs left running by a dead worker are failed first.
+    """
+    reap_stale_jobs()
+    queued = ImportJob.objects.filter(status=ImportJob.STATUS_QUEUED).order_by('created_at')
+    for job_id in queued.values_list('pk', flat=True)[:10]:
+        claimed = ImportJob.objects.filter(pk=job_id, status=ImportJob.STATUS_QUEUED).update(
+            status=ImportJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+        )
+        if claimed:
+            return ImportJob.objects.get(pk=job_id)
+    return None
+
+
+def run_import_job(job):
+    """Process an ImportJob chunk by chunk, saving progress after every chunk."""
+    progress_fields = ['rows_done', 'created_count', 'updated_count', 'skipped_count', 'updated_at']
+    try:
+        try:
+            job.total_rows = estimate_rows(job.file)
+        except Exception:
+            job.total_rows = None
+        job.save(update_fields=['total_rows', 'updated_at'])
+
+        with open_sheet(job.file) as (headers, rows):
+            if job.kind == ImportJob.KIND_LISTENER:
+                mapping = resolve_columns(headers, LISTENER_COLUMNS)
+                importer = ListenerImporter(job.record_type)
+            else:
+                mapping = resolve_columns(headers, STUDENT_RECORD_COLUMNS)
+                if 'full_name' not in mapping.values():
+                    raise ValueError("Excel faylda 'F.I.SH' ustuni topilmadi.")
+                importer = StudentRecordImporter()
+
+            for frame in iter_frames(rows, mapping):
+                importer.import_frame(frame)
+                job.rows_done += len(frame)
+                job.created_count = importer.counts['created']
+                job.updated_count = importer.counts['updated']
+                job.skipped_count = importer.counts['skipped']
+                job.save(update_fields=progress_fields)
+
+        job.status = ImportJob.STATUS_DONE
+    except Exception as exc:
+        # Chunks committed so far stay in the database
+        job.status = ImportJob.STATUS_FAILED
+        job.error = str(exc)
+
+    # The sheet is never read again, whatever the outcome
+    name, storage = job.file.name, job.file.storage
+    job.file = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'file', 'finished_at', 'updated_at'])
+    if not isinstance(storage, ContentAddressedStorage):
+        # A content-addressed upload is released by the save itself (see signals)
+        remove_upload(name, storage)
+    return job
@@ -0,0 +1,42 @@
+"""Fill size, MIME type, extension and hash of Document rows saved before they were captured."""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import page_cache
+from core.models import Document
+
+
+class Command(BaseCommand):
+    help = "Hujjatlar uchun fayl hajmi, MIME turi, kengaytmasi va SHA-256 xeshini hisoblaydi."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Ma'lumotlari bor hujjatlarni ham qayta hisoblash",
+        )
+
+    def handle(self, *args, **options):
+        documents = Document.objects.exclude(file='')
+        if not options['force']:
+            documents = documents.filter(content_hash='')
+        changed = []
+        missing = 0
+        now = timezone.now()
+        for document in documents.iterator(chunk_size=100):
+            try:
+                with document.file.open('rb'):
+                    document.set_file_metadata()
+            except FileNotFoundError:
+                missing += 1
+                continue
+            document.updated_at = now
+            changed.append(document)
+
+        # bulk_update sends no post_save; the cached pages show the new sizes after one bump
+        Document.objects.bulk_update(changed, Document.FILE_METADATA_FIELDS + ['updated_at'], batch_size=500)
+        if changed:
+            page_cache.bump_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(changed)} ta hujjat yangilandi, {missing} ta fayl topilmadi"
+        ))
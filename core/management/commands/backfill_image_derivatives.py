@@ -0,0 +1,166 @@
+"""Create missing or stale responsive image derivatives across a process pool."""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core import fragments, images, page_cache
+
+
+def image_fields():
+    """Yield ``(model, field)`` for every ResponsiveImageField in the core app."""
+    for model in apps.get_app_config('core').get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, images.ResponsiveImageField):
+                yield model, field
+
+
+class Command(BaseCommand):
+    help = "Yuklangan rasmlar uchun WebP/JPEG o'lchamlarini parallel ravishda yaratadi."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Parallel jarayonlar soni (standart: CPU yadrolari soni)",
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Manifestga qaramasdan barcha rasmlarni qayta ishlash",
+        )
+
+    def pending_images(self, force):
+        """Yield ``(storage, name, known_hash)`` for images that need work."""
+        seen = set()
+        for model, field in image_fields():
+            names = (
+                model.objects.exclude(**{field.name: ''})
+                .exclude(**{f'{field.name}__isnull': True})
+                .values_list(field.name, flat=True)
+                .distinct()
+            )
+            for name in names.iterator():
+                if name in seen:
+                    continue
+                seen.add(name)
+                storage = field.storage
+                if not storage.exists(name):
+                    self.counts['missing'] += 1
+                    continue
+                manifest = None if force else images.read_manifest(storage, name)
+                if images.is_current(manifest, storage, name):
+                    self.counts['skipped'] += 1
+                    continue
+                # Same settings, only the mtime moved: the worker compares hashes first
+                same_settings = bool(
+                    manifest
+                    and manifest.get('widths') == list(images.WIDTHS)
+                    and manifest.get('formats') == list(images.FORMATS)
+                    and manifest.get('width')
+                )
+                yield storage, name, manifest.get('sha256') if same_settings else None
+
+    def handle(self, *args, **options):
+        workers = max(options['workers'], 1)
+        self.counts = {'rendered': 0, 'refreshed': 0, 'skipped': 0, 'missing': 0, 'failed': 0}
+        started = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            for storage, name, known_hash in self.pending_images(options['force']):
+                try:
+                    source = storage.path(name)
+                except NotImplementedError:
+                    with storage.open(name, 'rb') as handle:
+                        source = handle.read()
+                future = pool.submit(images.render_source, source, images.WIDTHS, known_hash)
+                running[future] = (storage, name)
+                # Bound the number of in-flight images (and their rendered bytes)
+                if len(running) >= workers * 4:
+                    self.collect(running, wait(running, return_when=FIRST_COMPLETED).done, started)
+            self.collect(running, list(running), started)
+
+        filled = self.fill_from_manifests()
+        if self.counts['rendered'] or filled:
+            # Cached pages still point at the originals or lack the image sizes
+            page_cache.bump_version()
+
+        elapsed = time.monotonic() - started
+        rate = self.counts['rendered'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Tayyor: {self.counts['rendered']} ta rasm qayta ishlandi, "
+            f"{self.counts['refreshed']} ta manifest yangilandi, "
+            f"{self.counts['skipped']} ta o'tkazib yuborildi, "
+            f"{self.counts['missing']} ta fayl topilmadi, "
+            f"{self.counts['failed']} ta xato; "
+            f"{elapsed:.1f}s, {rate:.1f} rasm/s ({workers} jarayon)"
+        ))
+
+    def fill_from_manifests(self):
+        """
+        Copy image sizes and the derivative flag from the manifests into rows
+        that lack them; returns the row count.
+        """
+        filled = 0
+        now = timezone.now()
+        for model, field in image_fields():
+            pending = Q()
+            if field.width_field and field.height_field:
+                pending |= Q(**{f'{field.width_field}__isnull': True})
+            if field.derivatives_field:
+                pending |= Q(**{field.derivatives_field: False})
+            if not pending:
+                continue
+            rows = (
+                model.objects.filter(pending)
+                .exclude(**{field.name: ''})
+                .exclude(**{f'{field.name}__isnull': True})
+                .values_list('pk', field.name)
+            )
+            model_filled = 0
+            for pk, name in rows.iterator():
+                manifest = images.read_manifest(field.storage, name)
+                if not manifest or not manifest.get('width'):
+                    continue
+                values = {'updated_at': now}
+                if field.width_field and field.height_field:
+                    values.update({field.width_field: manifest['width'], field.height_field: manifest['height']})
+                if field.derivatives_field:
+                    values[field.derivatives_field] = True
+                # update() sends no signal: the sections and pages are invalidated below
+                model.objects.filter(pk=pk).update(**values)
+                model_filled += 1
+            if model_filled:
+                fragments.invalidate_for(model)
+                filled += model_filled
+        if filled:
+            self.stdout.write(f"{filled} ta yozuvga rasm o'lchamlari va nusxalari yozildi")
+        return filled
+
+    def collect(self, running, done, started):
+        """Store the results of finished futures."""
+        for future in done:
+            storage, name = running.pop(future)
+            try:
+                digest, outputs, size = future.result()
+                if outputs is None:
+                    # Source content unchanged; record the new mtime only
+                    manifest = images.read_manifest(storage, name)
+                    images.write_manifest(storage, name, digest, (manifest['width'], manifest['height']))
+                    self.counts['refreshed'] += 1
+                    continue
+                images.write_derivatives(storage, name, outputs, digest, size)
+            except Exception as exc:
+                self.counts['failed'] += 1
+                self.stderr.write(f"{name}: {exc}")
+                continue
+            self.counts['rendered'] += 1
+            if self.counts['rendered'] % 50 == 0:
+                rate = self.counts['rendered'] / (time.monotonic() - started)
+                self.stdout.write(f"{self.counts['rendered']} ta rasm, {rate:.1f} rasm/s")
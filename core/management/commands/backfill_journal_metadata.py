@@ -0,0 +1,74 @@
+"""Fill page count, file size and first-page covers of journal issues across a process pool."""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from core import pdfs
+from core.models import JournalIssue
+
+
+class Command(BaseCommand):
+    help = "Jurnal sonlari PDF fayllaridan sahifalar soni, hajmi va muqova rasmini oladi."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Parallel jarayonlar soni (standart: CPU yadrolari soni)",
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Ma'lumotlari bor sonlarni ham qayta ishlash",
+        )
+
+    def pending_issues(self, force):
+        issues = JournalIssue.objects.exclude(pdf_file='')
+        if not force:
+            # file_size is written by every attempt, so issues without a readable
+            # PDF or a renderable cover are not taken up again (--force retries them)
+            issues = issues.filter(file_size__isnull=True)
+        for issue in issues.iterator(chunk_size=100):
+            if not issue.pdf_file.storage.exists(issue.pdf_file.name):
+                self.counts['missing'] += 1
+                continue
+            yield issue
+
+    def handle(self, *args, **options):
+        if not pdfs.is_available():
+            self.stderr.write("pypdfium2 o'rnatilmagan: faqat fayl hajmi yoziladi")
+        workers = max(options['workers'], 1)
+        self.counts = {'updated': 0, 'missing': 0, 'failed': 0}
+        started = time.monotonic()
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            for issue in self.pending_issues(options['force']):
+                source = pdfs.pdf_source(issue.pdf_file)
+                running[pool.submit(pdfs.inspect_pdf, source, issue.wants_cover)] = issue
+                if len(running) >= workers * 2:
+                    self.collect(running, wait(running, return_when=FIRST_COMPLETED).done)
+            self.collect(running, list(running))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Tayyor: {self.counts['updated']} ta son yangilandi, "
+            f"{self.counts['missing']} ta fayl topilmadi, "
+            f"{self.counts['failed']} ta xato; {time.monotonic() - started:.1f}s"
+        ))
+
+    def collect(self, running, done):
+        for future in done:
+            issue = running.pop(future)
+            try:
+                page_count, cover = future.result()
+                issue.apply_pdf_metadata(issue.pdf_file.size, page_count, cover)
+                # save() sends post_save, so the cached journal page is refreshed
+                issue.save(update_fields=JournalIssue.PDF_METADATA_FIELDS + ['updated_at'])
+            except Exception as exc:
+                self.counts['failed'] += 1
+                self.stderr.write(f"{issue}: {exc}")
+                continue
+            self.counts['updated'] += 1
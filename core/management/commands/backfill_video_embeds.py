@@ -0,0 +1,30 @@
+"""Fill the stored embed fields of InternationalVideo rows saved before they existed."""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import page_cache
+from core.models import InternationalVideo
+
+
+EMBED_FIELDS = ['video_id', 'embed_url', 'thumbnail_url']
+
+
+class Command(BaseCommand):
+    help = "Xalqaro aloqalar videolari uchun embed havola, video ID va muqova rasmini hisoblaydi."
+
+    def handle(self, *args, **options):
+        changed = []
+        now = timezone.now()
+        videos = InternationalVideo.objects.only('pk', 'video_url', 'updated_at', *EMBED_FIELDS)
+        for video in videos.iterator(chunk_size=500):
+            before = [getattr(video, field) for field in EMBED_FIELDS]
+            video.set_embed_fields()
+            if [getattr(video, field) for field in EMBED_FIELDS] != before:
+                video.updated_at = now
+                changed.append(video)
+
+        # bulk_update sends no post_save; the cached pages show the new embeds after one bump
+        InternationalVideo.objects.bulk_update(changed, EMBED_FIELDS + ['updated_at'], batch_size=500)
+        if changed:
+            page_cache.bump_version()
+        self.stdout.write(self.style.SUCCESS(f"{len(changed)} ta video yangilandi"))
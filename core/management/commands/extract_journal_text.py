@@ -0,0 +1,114 @@
+"""Extract the per-page text of journal PDFs across a process pool and index it for search."""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import pdfs, search
+from core.models import JournalIssue, JournalPage
+
+
+class Command(BaseCommand):
+    help = "Jurnal sonlari PDF fayllaridan sahifama-sahifa matn ajratib, qidiruv indeksiga yozadi."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Parallel jarayonlar soni (standart: CPU yadrolari soni)",
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Matni ajratilgan sonlarni ham qayta ishlash",
+        )
+
+    def pending_issues(self, force):
+        issues = JournalIssue.objects.exclude(pdf_file='')
+        if not force:
+            issues = issues.filter(text_extracted=False)
+        for issue in issues.iterator(chunk_size=100):
+            if not issue.pdf_file.storage.exists(issue.pdf_file.name):
+                self.counts['missing'] += 1
+                continue
+            yield issue
+
+    def handle(self, *args, **options):
+        if not pdfs.text_available():
+            raise CommandError("pypdf o'rnatilmagan: pip install pypdf")
+        workers = max(options['workers'], 1)
+        self.counts = {'issues': 0, 'pages': 0, 'missing': 0, 'failed': 0}
+        started = time.monotonic()
+        # issue pk -> [issue, chunks still running, extracted pages, failed]
+        self.issues = {}
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            running = {}
+            for issue in self.pending_issues(options['force']):
+                source = pdfs.pdf_source(issue.pdf_file)
+                try:
+                    page_count = issue.page_count or pdfs.count_pages(source)
+                except Exception as exc:
+                    self.counts['failed'] += 1
+                    self.stderr.write(f"{issue}: {exc}")
+                    continue
+                chunks = range(0, page_count, pdfs.TEXT_CHUNK_PAGES)
+                self.issues[issue.pk] = [issue, len(chunks), [], False]
+                if not chunks:
+                    self.finish(issue.pk)
+                for start in chunks:
+                    future = pool.submit(pdfs.extract_text, source, start, start + pdfs.TEXT_CHUNK_PAGES)
+                    running[future] = issue.pk
+                    # Bound the number of in-flight chunks (and their text)
+                    if len(running) >= workers * 4:
+                        self.collect(running, wait(running, return_when=FIRST_COMPLETED).done)
+            self.collect(running, list(running))
+
+        elapsed = time.monotonic() - started
+        rate = self.counts['pages'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Tayyor: {self.counts['issues']} ta son, {self.counts['pages']} ta sahifa, "
+            f"{self.counts['missing']} ta fayl topilmadi, {self.counts['failed']} ta xato; "
+            f"{elapsed:.1f}s, {rate:.1f} sahifa/s ({workers} jarayon)"
+        ))
+
+    def collect(self, running, done):
+        for future in done:
+            issue_pk = running.pop(future)
+            state = self.issues[issue_pk]
+            state[1] -= 1
+            try:
+                state[2].extend(future.result())
+            except Exception as exc:
+                if not state[3]:
+                    self.counts['failed'] += 1
+                    self.stderr.write(f"{state[0]}: {exc}")
+                state[3] = True
+            if not state[1]:
+                self.finish(issue_pk)
+
+    def finish(self, issue_pk):
+        """Replace the stored pages of an issue once all of its chunks are back."""
+        issue, _, pages, failed = self.issues.pop(issue_pk)
+        if failed:
+            # Keep the previous pages; the issue stays pending for the next run
+            return
+        rows = [JournalPage(issue=issue, page_number=number, text=text) for number, text in sorted(pages)]
+        for row in rows:
+            row.search_text = row.build_search_text()
+        with transaction.atomic():
+            # post_delete drops the old rows from the search index
+            JournalPage.objects.filter(issue=issue).delete()
+            JournalPage.objects.bulk_create(rows, batch_size=500)
+            if any(row.pk is None for row in rows):
+                pks = JournalPage.objects.filter(issue=issue).values_list('pk', flat=True)
+            else:
+                pks = [row.pk for row in rows]
+            search.index_objects(JournalPage, pks)
+            # update() keeps updated_at and sends no signal: no public page shows the text
+            JournalIssue.objects.filter(pk=issue.pk).update(text_extracted=True)
+        self.counts['issues'] += 1
+        self.counts['pages'] += len(rows)
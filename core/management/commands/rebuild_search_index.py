@@ -0,0 +1,23 @@
+"""Recompute the stored search text and rebuild the full-text search index from scratch."""
+from django.core.management.base import BaseCommand
+
+from core import search
+
+
+class Command(BaseCommand):
+    help = "Tinglovchilar va yozuvlar uchun to'liq matnli qidiruv indeksini qayta quradi."
+
+    def handle(self, *args, **options):
+        search.ensure_tables()
+        for model in search.SEARCH_FIELDS:
+            # Rows saved before a change of SEARCH_TEXT_FIELDS keep their old text until now
+            refreshed = search.refresh_search_text(model)
+            if refreshed:
+                self.stdout.write(f"{model._meta.verbose_name_plural}: {refreshed} ta qidiruv matni yangilandi")
+            if not search.is_enabled(model):
+                self.stdout.write(self.style.WARNING(
+                    f"{model._meta.verbose_name_plural}: indeks mavjud emas (FTS qo'llab-quvvatlanmaydi)"
+                ))
+                continue
+            search.rebuild(model)
+            self.stdout.write(self.style.SUCCESS(f"{model._meta.verbose_name_plural}: indeks qayta qurildi"))
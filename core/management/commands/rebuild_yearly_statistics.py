@@ -0,0 +1,18 @@
+"""Recount the yearly registry counters from Listener and StudentTrainingRecord."""
+from django.core.management.base import BaseCommand
+
+from core import counters
+
+
+class Command(BaseCommand):
+    help = "Yillik statistikani tinglovchilar reyestri va yozuvlaridan to'liq qayta hisoblaydi."
+
+    def handle(self, *args, **options):
+        rows = counters.rebuild()
+        for year, counts in sorted(rows.items()):
+            self.stdout.write(
+                f"{year}: MO {counts['professional_development_count']}, "
+                f"QT {counts['retraining_count']}, "
+                f"yozuvlar {counts['student_record_count']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(rows)} yil uchun statistika qayta hisoblandi"))
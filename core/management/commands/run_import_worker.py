@@ -0,0 +1,47 @@
+"""Background worker that processes queued Excel imports."""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.importers import claim_next_job, run_import_job
+
+
+class Command(BaseCommand):
+    help = "Navbatdagi Excel import vazifalarini bajaradi (ImportJob)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2.0,
+            help="Navbat bo'sh bo'lganda tekshirish oralig'i (soniya)",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Navbatdagi barcha vazifalarni bajarib, to'xtash",
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        self.stdout.write(f"Import worker ishga tushdi (interval: {interval}s)")
+        try:
+            while True:
+                job = claim_next_job()
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(interval)
+                    continue
+
+                self.stdout.write(f"[{job.pk}] {job} boshlandi")
+                run_import_job(job)
+                if job.status == job.STATUS_DONE:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"[{job.pk}] tugadi: {job.created_count} yangi, "
+                        f"{job.updated_count} yangilandi, {job.skipped_count} o'tkazib yuborildi"
+                    ))
+                else:
+                    self.stdout.write(self.style.ERROR(f"[{job.pk}] xatolik: {job.error}"))
+        except KeyboardInterrupt:
+            self.stdout.write("Import worker to'xtatildi")
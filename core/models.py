@@ -2,11 +2,20 @@
 Models for the Educational Center Management System.
 Simplified and cleaned up version.
 """
+import hashlib
+import mimetypes
 import os
+import re
 import uuid
-from django.db import models
+from django.core.files.base import ContentFile
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from . import embeds, pdfs, singletons
+from .images import ResponsiveImageField
+from .storage import ContentAddressedStorage, content_hash
+from .transliteration import search_text
+
 
 def generate_unique_filename(instance, filename):
     """Generate unique filename for uploaded files."""
@@ -16,6 +25,21 @@ def generate_unique_filename(instance, filename):
     return os.path.join(f'uploads/{model_name}/', unique_name)
 
 
+def normalize_key_part(value):
+    """Collapse whitespace and case-fold one natural key component."""
+    return re.sub(r'\s+', ' ', str(value or '')).strip().casefold()
+
+
+def hash_natural_key(*normalized_parts):
+    """SHA-256 over already normalized key parts."""
+    return hashlib.sha256('\x1f'.join(normalized_parts).encode('utf-8')).hexdigest()
+
+
+def student_record_key(full_name, workplace, course_name):
+    """Natural key of a StudentTrainingRecord (F.I.SH + ish joyi + yo'nalish)."""
+    return hash_natural_key(*(normalize_key_part(v) for v in (full_name, workplace, course_name)))
+
+
 class BaseModel(models.Model):
     """Abstract base model with common fields."""
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Yaratilgan vaqt")
@@ -25,6 +49,33 @@ class BaseModel(models.Model):
         abstract = True
 
 
+class SingletonModel(BaseModel):
+    """
+    Abstract base for single-row models (pk=1).
+
+    ``get_instance()`` returns a read-only snapshot from the process-local
+    cache in ``core.singletons``; edit the row through the admin or a fresh
+    ``objects.get(pk=1)``.
+    """
+
+    class Meta:
+        abstract = True
+
+    def __setattr__(self, name, value):
+        if self.__dict__.get('_frozen'):
+            raise AttributeError(f"{type(self).__name__}.get_instance() snapshot is read-only")
+        super().__setattr__(name, value)
+
+    def save(self, *args, **kwargs):
+        if self.__dict__.get('_frozen'):
+            raise TypeError(f"{type(self).__name__}.get_instance() snapshot can't be saved")
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def get_instance(cls):
+        return singletons.get(cls)
+
+
 class News(BaseModel):
     """Yangiliklar modeli"""
     title = models.CharField(max_length=500, verbose_name="Sarlavha")
@@ -44,7 +95,16 @@ class News(BaseModel):
 class NewsImage(BaseModel):
     """Yangilik rasmlari (inline)"""
     news = models.ForeignKey(News, on_delete=models.CASCADE, related_name='images', verbose_name="Yangilik")
-    image = models.ImageField(upload_to=generate_unique_filename, verbose_name="Rasm")
+    image = ResponsiveImageField(
+        upload_to=generate_unique_filename,
+        verbose_name="Rasm",
+        width_field='image_width',
+        height_field='image_height',
+        derivatives_field='image_derivatives',
+    )
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm eni")
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm bo'yi")
+    image_derivatives = models.BooleanField(default=False, editable=False, verbose_name="Rasm nusxalari tayyor")
     order = models.PositiveIntegerField(default=0, verbose_name="Tartib")
 
     class Meta:
@@ -59,7 +119,16 @@ class NewsImage(BaseModel):
 class GalleryItem(BaseModel):
     """Galereya modeli (albom - bir nechta rasm bilan)"""
     title = models.CharField(max_length=200, verbose_name="Sarlavha", blank=True, default="")
-    cover_image = models.ImageField(upload_to=generate_unique_filename, verbose_name="Muqova rasmi")
+    cover_image = ResponsiveImageField(
+        upload_to=generate_unique_filename,
+        verbose_name="Muqova rasmi",
+        width_field='cover_image_width',
+        height_field='cover_image_height',
+        derivatives_field='cover_image_derivatives',
+    )
+    cover_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm eni")
+    cover_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm bo'yi")
+    cover_image_derivatives = models.BooleanField(default=False, editable=False, verbose_name="Rasm nusxalari tayyor")
     order = models.PositiveIntegerField(default=0, verbose_name="Tartib")
     is_active = models.BooleanField(default=True, verbose_name="Faol")
 
@@ -75,7 +144,16 @@ class GalleryItem(BaseModel):
 class GalleryImage(BaseModel):
     """Galereya ichidagi rasmlar"""
     gallery = models.ForeignKey(GalleryItem, on_delete=models.CASCADE, related_name='images', verbose_name="Galereya")
-    image = models.ImageField(upload_to=generate_unique_filename, verbose_name="Rasm")
+    image = ResponsiveImageField(
+        upload_to=generate_unique_filename,
+        verbose_name="Rasm",
+        width_field='image_width',
+        height_field='image_height',
+        derivatives_field='image_derivatives',
+    )
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm eni")
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm bo'yi")
+    image_derivatives = models.BooleanField(default=False, editable=False, verbose_name="Rasm nusxalari tayyor")
     order = models.PositiveIntegerField(default=0, verbose_name="Tartib")
 
     class Meta:
@@ -107,12 +185,19 @@ class Listener(BaseModel):
     number = models.CharField(max_length=50, verbose_name="Raqam")
     duration = models.CharField(max_length=200, blank=True, verbose_name="O'qish muddati (davri)")
     is_verified = models.BooleanField(default=True, verbose_name="Tasdiqlangan")
+    # Case-folded, Latin-script, apostrophe-free copy of the searchable fields
+    search_text = models.TextField(blank=True, editable=False, verbose_name="Qidiruv matni")
+
+    SEARCH_TEXT_FIELDS = ['full_name', 'workplace', 'course_type', 'series', 'number', 'record_type']
 
     class Meta:
         verbose_name = "Tinglovchi"
         verbose_name_plural = "Tinglovchilar (Sertifikatlar)"
         ordering = ['-created_at']
         unique_together = ['series', 'number']
+        indexes = [
+            models.Index(fields=['record_type', 'number'], name='listener_type_number_idx'),
+        ]
 
     def __str__(self):
         return f"{self.full_name} - {self.series} {self.number}"
@@ -126,9 +211,13 @@ class Listener(BaseModel):
         
         # ALWAYS set series from record_type for consistent search
         self.series = self.record_type
-        
+        self.search_text = self.build_search_text()
+
         super().save(*args, **kwargs)
 
+    def build_search_text(self):
+        return search_text(*(getattr(self, field) for field in self.SEARCH_TEXT_FIELDS))
+
 
 class StudentTrainingRecord(BaseModel):
     """Tinglovchilar uchun alohida qidiruv modeli (Excel orqali)."""
@@ -137,6 +226,17 @@ class StudentTrainingRecord(BaseModel):
     course_name = models.CharField(max_length=400, blank=True, verbose_name="Malaka oshirish yo'nalishi")
     training_time = models.CharField(max_length=200, blank=True, verbose_name="Malaka oshirish vaqti")
     is_active = models.BooleanField(default=True, verbose_name="Faol")
+    natural_key = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False,
+        verbose_name="Tabiiy kalit"
+    )
+    # Case-folded, Latin-script, apostrophe-free copy of the searchable fields
+    search_text = models.TextField(blank=True, editable=False, verbose_name="Qidiruv matni")
+
+    SEARCH_TEXT_FIELDS = ['full_name', 'workplace', 'course_name', 'training_time']
 
     class Meta:
         verbose_name = "Tinglovchi yozuvi"
@@ -146,6 +246,68 @@ class StudentTrainingRecord(BaseModel):
     def __str__(self):
         return self.full_name
 
+    def save(self, *args, **kwargs):
+        # Indexed hash of the normalized natural key, used by Excel imports to match rows
+        self.natural_key = student_record_key(self.full_name, self.workplace, self.course_name)
+        self.search_text = self.build_search_text()
+        super().save(*args, **kwargs)
+
+    def build_search_text(self):
+        return search_text(*(getattr(self, field) for field in self.SEARCH_TEXT_FIELDS))
+
+
+class ImportJob(BaseModel):
+    """Excel import vazifasi (fon rejimidagi worker bajaradi)"""
+    KIND_LISTENER = 'listener'
+    KIND_STUDENT_RECORD = 'student_record'
+    KIND_CHOICES = [
+        (KIND_LISTENER, 'Tinglovchilar (Sertifikatlar)'),
+        (KIND_STUDENT_RECORD, 'Tinglovchilar uchun yozuvlar'),
+    ]
+
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Navbatda'),
+        (STATUS_RUNNING, 'Bajarilmoqda'),
+        (STATUS_DONE, 'Yakunlandi'),
+        (STATUS_FAILED, 'Xatolik'),
+    ]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES, verbose_name="Import turi")
+    record_type = models.CharField(max_length=5, blank=True, verbose_name="Sertifikat turi")
+    file = models.FileField(upload_to=generate_unique_filename, verbose_name="Fayl")
+    original_name = models.CharField(max_length=255, blank=True, verbose_name="Fayl nomi")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_QUEUED,
+        db_index=True,
+        verbose_name="Holati"
+    )
+    total_rows = models.PositiveIntegerField(null=True, blank=True, verbose_name="Jami qatorlar")
+    rows_done = models.PositiveIntegerField(default=0, verbose_name="Bajarilgan qatorlar")
+    created_count = models.PositiveIntegerField(default=0, verbose_name="Yangi")
+    updated_count = models.PositiveIntegerField(default=0, verbose_name="Yangilangan")
+    skipped_count = models.PositiveIntegerField(default=0, verbose_name="O'tkazib yuborilgan")
+    error = models.TextField(blank=True, verbose_name="Xatolik")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Boshlangan vaqt")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Tugagan vaqt")
+
+    class Meta:
+        verbose_name = "Import vazifasi"
+        verbose_name_plural = "Import vazifalari"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.original_name or self.pk}"
+
+    @property
+    def is_active(self):
+        return self.status in (self.STATUS_QUEUED, self.STATUS_RUNNING)
+
 
 class Teacher(BaseModel):
     """O'qituvchilar modeli"""
@@ -153,12 +315,18 @@ class Teacher(BaseModel):
     position = models.CharField(max_length=200, verbose_name="Lavozimi")
     degree = models.CharField(max_length=200, blank=True, verbose_name="Ilmiy darajasi")
     title = models.CharField(max_length=200, blank=True, verbose_name="Unvoni")
-    photo = models.ImageField(
+    photo = ResponsiveImageField(
         upload_to=generate_unique_filename,
         blank=True,
         null=True,
-        verbose_name="Rasm"
+        verbose_name="Rasm",
+        width_field='photo_width',
+        height_field='photo_height',
+        derivatives_field='photo_derivatives',
     )
+    photo_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm eni")
+    photo_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm bo'yi")
+    photo_derivatives = models.BooleanField(default=False, editable=False, verbose_name="Rasm nusxalari tayyor")
     order = models.PositiveIntegerField(default=0, verbose_name="Tartib")
     is_active = models.BooleanField(default=True, verbose_name="Faol")
 
@@ -182,12 +350,18 @@ class Personnel(BaseModel):
     position = models.CharField(max_length=200, verbose_name="Lavozimi")
     phone = models.CharField(max_length=50, blank=True, verbose_name="Telefon")
     reception_hours = models.CharField(max_length=200, blank=True, verbose_name="Qabul soatlari")
-    photo = models.ImageField(
+    photo = ResponsiveImageField(
         upload_to=generate_unique_filename,
         blank=True,
         null=True,
-        verbose_name="Rasm"
+        verbose_name="Rasm",
+        width_field='photo_width',
+        height_field='photo_height',
+        derivatives_field='photo_derivatives',
     )
+    photo_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm eni")
+    photo_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm bo'yi")
+    photo_derivatives = models.BooleanField(default=False, editable=False, verbose_name="Rasm nusxalari tayyor")
     category = models.CharField(
         max_length=20,
         choices=CATEGORY_CHOICES,
@@ -242,14 +416,35 @@ class JournalIssue(BaseModel):
         upload_to=generate_unique_filename,
         verbose_name="PDF fayl"
     )
-    thumbnail = models.ImageField(
+    thumbnail = ResponsiveImageField(
         upload_to=generate_unique_filename,
         blank=True,
         null=True,
-        verbose_name="Muqova rasmi"
+        verbose_name="Muqova rasmi",
+        width_field='thumbnail_width',
+        height_field='thumbnail_height',
+        derivatives_field='thumbnail_derivatives',
     )
+    thumbnail_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm eni")
+    thumbnail_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm bo'yi")
+    thumbnail_derivatives = models.BooleanField(default=False, editable=False, verbose_name="Rasm nusxalari tayyor")
+    # Read from pdf_file on upload (see core.pdfs)
+    page_count = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Sahifalar soni")
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name="Fayl hajmi")
+    thumbnail_generated = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name="Muqova PDF dan olingan"
+    )
+    # Set by the extract_journal_text command once every page is in JournalPage
+    text_extracted = models.BooleanField(default=False, editable=False, verbose_name="Matni ajratilgan")
     is_active = models.BooleanField(default=True, verbose_name="Faol")
 
+    PDF_METADATA_FIELDS = [
+        'page_count', 'file_size', 'thumbnail', 'thumbnail_width', 'thumbnail_height', 'thumbnail_derivatives',
+        'thumbnail_generated',
+    ]
+
     class Meta:
         verbose_name = "Jurnal soni"
         verbose_name_plural = "Jurnal sonlari"
@@ -258,6 +453,95 @@ class JournalIssue(BaseModel):
     def __str__(self):
         return f"Jurnal {self.year} #{self.issue_number}"
 
+    @property
+    def wants_cover(self):
+        """True when the thumbnail may be replaced by a rendering of the first page."""
+        return not self.thumbnail or self.thumbnail_generated
+
+    def apply_pdf_metadata(self, file_size, page_count, cover):
+        """Store the values returned by ``pdfs.inspect_pdf``; ``cover`` is JPEG bytes or None."""
+        self.file_size = file_size
+        self.page_count = page_count
+        if cover and self.wants_cover:
+            # Stored like an admin upload, so it is normalized and gets derivatives
+            self._generated_cover = ContentFile(cover, name='cover.jpg')
+            self.thumbnail = self._generated_cover
+            self.thumbnail_generated = True
+
+    def set_pdf_metadata(self):
+        """Read page count, size and the first-page cover from ``pdf_file``."""
+        page_count, cover = pdfs.inspect_pdf(pdfs.pdf_source(self.pdf_file), cover=self.wants_cover)
+        self.apply_pdf_metadata(self.pdf_file.size, page_count, cover)
+
+    def replaced_generated_cover(self, update_fields=None):
+        """Stored name of the generated cover that this save replaces or clears, or None."""
+        if self._state.adding or (update_fields is not None and 'thumbnail' not in update_fields):
+            return None
+        if self.thumbnail and self.thumbnail._committed:
+            # The stored cover is kept
+            return None
+        if not self.thumbnail and not self.thumbnail_generated:
+            return None
+        stored = JournalIssue.objects.filter(pk=self.pk, thumbnail_generated=True).values_list('thumbnail', flat=True)
+        return stored.first() or None
+
+    def save(self, *args, **kwargs):
+        replaced_cover = self.replaced_generated_cover(kwargs.get('update_fields'))
+        if (
+            self.thumbnail
+            and not self.thumbnail._committed
+            and self.thumbnail.file is not getattr(self, '_generated_cover', None)
+        ):
+            # An uploaded cover replaces the generated one for good
+            self.thumbnail_generated = False
+        new_pdf = bool(self.pdf_file) and not self.pdf_file._committed
+        if new_pdf:
+            self.set_pdf_metadata()
+            # The text is extracted again from the new file
+            self.text_extracted = False
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.PDF_METADATA_FIELDS) | {'text_extracted'}
+        super().save(*args, **kwargs)
+        if new_pdf:
+            self.pages.all().delete()
+        storage = self.thumbnail.storage
+        if replaced_cover and replaced_cover != self.thumbnail.name and not isinstance(storage, ContentAddressedStorage):
+            # Nothing else refers to a generated cover; content-addressed ones are released by signals
+            transaction.on_commit(lambda: storage.delete(replaced_cover))
+
+
+class JournalPage(BaseModel):
+    """Jurnal sonining bir sahifasi matni (PDF dan ajratilgan, qidiruv uchun)."""
+    issue = models.ForeignKey(
+        JournalIssue,
+        on_delete=models.CASCADE,
+        related_name='pages',
+        verbose_name="Jurnal soni"
+    )
+    page_number = models.PositiveIntegerField(verbose_name="Sahifa")
+    text = models.TextField(verbose_name="Matn")
+    # Case-folded, Latin-script, apostrophe-free copy of the text
+    search_text = models.TextField(blank=True, editable=False, verbose_name="Qidiruv matni")
+
+    SEARCH_TEXT_FIELDS = ['text']
+
+    class Meta:
+        verbose_name = "Jurnal sahifasi"
+        verbose_name_plural = "Jurnal sahifalari"
+        ordering = ['issue', 'page_number']
+        unique_together = ['issue', 'page_number']
+
+    def __str__(self):
+        return f"{self.issue} - {self.page_number}-bet"
+
+    def save(self, *args, **kwargs):
+        self.search_text = self.build_search_text()
+        super().save(*args, **kwargs)
+
+    def build_search_text(self):
+        return search_text(*(getattr(self, field) for field in self.SEARCH_TEXT_FIELDS))
+
 
 class Document(BaseModel):
     """Hujjatlar modeli"""
@@ -278,8 +562,15 @@ class Document(BaseModel):
         upload_to=generate_unique_filename,
         verbose_name="Fayl"
     )
+    # Captured from the upload, so pages never ask the storage about the file
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False, verbose_name="Fayl hajmi")
+    mime_type = models.CharField(max_length=100, blank=True, editable=False, verbose_name="MIME turi")
+    extension = models.CharField(max_length=20, blank=True, editable=False, verbose_name="Kengaytma")
+    content_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name="SHA-256")
     is_active = models.BooleanField(default=True, verbose_name="Faol")
 
+    FILE_METADATA_FIELDS = ['file_size', 'mime_type', 'extension', 'content_hash']
+
     class Meta:
         verbose_name = "Hujjat"
         verbose_name_plural = "Hujjatlar"
@@ -288,8 +579,23 @@ class Document(BaseModel):
     def __str__(self):
         return self.title
 
+    def set_file_metadata(self):
+        """Read size, type, extension and SHA-256 of ``file`` (a new upload or the stored file)."""
+        self.file_size = self.file.size
+        self.mime_type = mimetypes.guess_type(self.file.name)[0] or 'application/octet-stream'
+        self.extension = os.path.splitext(self.file.name)[1].lstrip('.').lower()[:20]
+        self.content_hash = content_hash(self.file)
 
-class InternationalRelation(BaseModel):
+    def save(self, *args, **kwargs):
+        if self.file and not self.file._committed:
+            self.set_file_metadata()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | set(self.FILE_METADATA_FIELDS)
+        super().save(*args, **kwargs)
+
+
+class InternationalRelation(SingletonModel):
     """Xalqaro aloqalar sahifasi uchun asosiy ma'lumotlar (singleton)."""
     title = models.CharField(
         max_length=255,
@@ -305,18 +611,22 @@ class InternationalRelation(BaseModel):
     def __str__(self):
         return self.title
 
-    @classmethod
-    def get_instance(cls):
-        instance, created = cls.objects.get_or_create(pk=1)
-        return instance
-
 
 class ForeignPartner(BaseModel):
     """Xorijiy hamkor tashkilotlar modeli."""
     organization_name = models.CharField(max_length=255, verbose_name="Tashkilot nomi")
     country = models.CharField(max_length=150, verbose_name="Mamlakat")
     short_info = models.TextField(verbose_name="Qisqacha ma'lumot")
-    image = models.ImageField(upload_to=generate_unique_filename, verbose_name="Rasm")
+    image = ResponsiveImageField(
+        upload_to=generate_unique_filename,
+        verbose_name="Rasm",
+        width_field='image_width',
+        height_field='image_height',
+        derivatives_field='image_derivatives',
+    )
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm eni")
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm bo'yi")
+    image_derivatives = models.BooleanField(default=False, editable=False, verbose_name="Rasm nusxalari tayyor")
     order = models.PositiveIntegerField(default=0, verbose_name="Tartib")
     is_active = models.BooleanField(default=True, verbose_name="Faol")
 
@@ -369,7 +679,16 @@ class InternationalPhoto(BaseModel):
         related_name='photos',
         verbose_name="Xalqaro aloqalar"
     )
-    image = models.ImageField(upload_to=generate_unique_filename, verbose_name="Rasm")
+    image = ResponsiveImageField(
+        upload_to=generate_unique_filename,
+        verbose_name="Rasm",
+        width_field='image_width',
+        height_field='image_height',
+        derivatives_field='image_derivatives',
+    )
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm eni")
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm bo'yi")
+    image_derivatives = models.BooleanField(default=False, editable=False, verbose_name="Rasm nusxalari tayyor")
     order = models.PositiveIntegerField(default=0, verbose_name="Tartib")
     is_active = models.BooleanField(default=True, verbose_name="Faol")
 
@@ -392,6 +711,10 @@ class InternationalVideo(BaseModel):
     )
     title = models.CharField(max_length=255, blank=True, verbose_name="Sarlavha")
     video_url = models.URLField(verbose_name="Video havola")
+    # Derived from video_url on save
+    video_id = models.CharField(max_length=32, blank=True, editable=False, verbose_name="Video ID")
+    embed_url = models.URLField(max_length=500, blank=True, editable=False, verbose_name="Embed havola")
+    thumbnail_url = models.URLField(max_length=500, blank=True, editable=False, verbose_name="Muqova rasmi havolasi")
     order = models.PositiveIntegerField(default=0, verbose_name="Tartib")
     is_active = models.BooleanField(default=True, verbose_name="Faol")
 
@@ -403,10 +726,31 @@ class InternationalVideo(BaseModel):
     def __str__(self):
         return self.title or f"Video #{self.order}"
 
+    def set_embed_fields(self):
+        """Parse video_url into video_id, embed_url and thumbnail_url."""
+        self.video_id, self.embed_url = embeds.parse_video(self.video_url)
+        self.thumbnail_url = embeds.thumbnail_url(self.video_id)
+
+    def save(self, *args, **kwargs):
+        self.set_embed_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'video_url' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'video_id', 'embed_url', 'thumbnail_url'}
+        super().save(*args, **kwargs)
+
 
 class ArtGalleryItem(BaseModel):
     """Bosh sahifadagi Art Galereya kartasi."""
-    image = models.ImageField(upload_to=generate_unique_filename, verbose_name="Rasm")
+    image = ResponsiveImageField(
+        upload_to=generate_unique_filename,
+        verbose_name="Rasm",
+        width_field='image_width',
+        height_field='image_height',
+        derivatives_field='image_derivatives',
+    )
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm eni")
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm bo'yi")
+    image_derivatives = models.BooleanField(default=False, editable=False, verbose_name="Rasm nusxalari tayyor")
     name = models.CharField(max_length=255, verbose_name="Nomi")
     author_full_name = models.CharField(max_length=255, verbose_name="Ism familiya")
     text = models.TextField(verbose_name="Matn")
@@ -430,7 +774,16 @@ class ArtGalleryImage(BaseModel):
         related_name='images',
         verbose_name="Art galereya elementi"
     )
-    image = models.ImageField(upload_to=generate_unique_filename, verbose_name="Rasm")
+    image = ResponsiveImageField(
+        upload_to=generate_unique_filename,
+        verbose_name="Rasm",
+        width_field='image_width',
+        height_field='image_height',
+        derivatives_field='image_derivatives',
+    )
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm eni")
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm bo'yi")
+    image_derivatives = models.BooleanField(default=False, editable=False, verbose_name="Rasm nusxalari tayyor")
     order = models.PositiveIntegerField(default=0, verbose_name="Tartib")
 
     class Meta:
@@ -442,7 +795,7 @@ class ArtGalleryImage(BaseModel):
         return f"{self.art_item.name} - {self.order}"
 
 
-class Statistics(BaseModel):
+class Statistics(SingletonModel):
     """Statistika modeli (faqat bitta yozuv bo'ladi)"""
     professors = models.PositiveIntegerField(default=0, verbose_name="Professorlar soni")
     dotsents = models.PositiveIntegerField(default=0, verbose_name="Dotsentlar soni")
@@ -460,23 +813,25 @@ class Statistics(BaseModel):
     def __str__(self):
         return "Markaz Statistikasi"
 
-    @classmethod
-    def get_instance(cls):
-        instance, created = cls.objects.get_or_create(pk=1)
-        return instance
-
 
 class YearlyStatistics(BaseModel):
-    """Yillik statistika modeli"""
+    """Yillik statistika modeli (reyestrdan hisoblanadi, qo'lda kiritilmaydi; core.counters)"""
     year = models.CharField(max_length=10, unique=True, verbose_name="Yil")
     professional_development_count = models.PositiveIntegerField(
         default=0,
+        editable=False,
         verbose_name="Malaka oshirish soni"
     )
     retraining_count = models.PositiveIntegerField(
         default=0,
+        editable=False,
         verbose_name="Qayta tayyorlash soni"
     )
+    student_record_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Tinglovchi yozuvlari soni"
+    )
 
     class Meta:
         verbose_name = "Yillik statistika"
@@ -487,19 +842,25 @@ class YearlyStatistics(BaseModel):
         return f"Statistika {self.year}"
 
 
-class AppContent(BaseModel):
+class AppContent(SingletonModel):
     """Markaz haqida ma'lumotlar (singleton model)"""
     # Umumiy ma'lumot
     history = models.TextField(blank=True, verbose_name="Umumiy ma'lumot")
     
     # Markaz tuzilmasi
     structure = models.TextField(blank=True, verbose_name="Tuzilma haqida matn")
-    structure_image = models.ImageField(
+    structure_image = ResponsiveImageField(
         upload_to=generate_unique_filename,
         blank=True,
         null=True,
-        verbose_name="Tuzilma rasmi"
+        verbose_name="Tuzilma rasmi",
+        width_field='structure_image_width',
+        height_field='structure_image_height',
+        derivatives_field='structure_image_derivatives',
     )
+    structure_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm eni")
+    structure_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name="Rasm bo'yi")
+    structure_image_derivatives = models.BooleanField(default=False, editable=False, verbose_name="Rasm nusxalari tayyor")
     
     # Tinglovchilar uchun eslatmalar
     student_notes = models.TextField(blank=True, verbose_name="Tinglovchilar uchun eslatma")
@@ -515,13 +876,8 @@ class AppContent(BaseModel):
     def __str__(self):
         return "Markaz haqida ma'lumotlar"
 
-    @classmethod
-    def get_instance(cls):
-        instance, created = cls.objects.get_or_create(pk=1)
-        return instance
-
 
-class JournalSettings(BaseModel):
+class JournalSettings(SingletonModel):
     """Ilmiy jurnal sozlamalari (singleton model)"""
     # Maqola berish tartibi
     article_rules_text = models.TextField(blank=True, verbose_name="Maqola berish tartibi matni")
@@ -542,7 +898,15 @@ class JournalSettings(BaseModel):
     def __str__(self):
         return "Ilmiy jurnal sozlamalari"
 
-    @classmethod
-    def get_instance(cls):
-        instance, created = cls.objects.get_or_create(pk=1)
-        return instance
+
+class StoredFile(BaseModel):
+    """Reference count of a content-addressed media file (see core.storage)."""
+    name = models.CharField(max_length=255, unique=True, verbose_name="Fayl nomi")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="Havolalar soni")
+
+    class Meta:
+        verbose_name = "Saqlangan fayl"
+        verbose_name_plural = "Saqlangan fayllar"
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
@@ -0,0 +1,163 @@
+"""
+Full-response cache for the public pages.
+
+Anonymous GET/HEAD responses are stored whole and served again without
+touching the ORM or the template engine. Every key contains a global content
+version; any write to a content model bumps it, which orphans all cached
+pages at once (they expire on their own). Requests carrying a session cookie
+(admin/staff) always bypass the cache.
+
+Keys are built from the path and only the query parameters a view declares
+(``cache_public_page(params=[...])``); tracking parameters are ignored, and
+a request with any other parameter is rendered without being stored, so
+made-up query strings can't fill the cache or evict real pages.
+
+Each entry also stores its validators: a strong ETag hashed from the build
+version and the rendered bytes, and the time it was rendered as
+Last-Modified. A hit answers ``If-None-Match``/``If-Modified-Since`` with a
+304 from the entry alone. Keys and ETags include the build version (templates
+and code), so a deploy never serves or validates HTML from the old build.
+
+Use a shared backend (``FileBasedCache`` by default) so every gunicorn
+worker sees the same pages and the same version.
+"""
+import hashlib
+import os
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+CACHE_ALIAS = getattr(settings, 'PAGE_CACHE_ALIAS', 'default')
+CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60)
+
+VERSION_KEY = 'page:version'
+
+# Query parameters that never change a page (campaign and click trackers)
+IGNORED_PARAMS = ('utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content', 'fbclid', 'gclid', 'yclid')
+
+# Headers kept with a cached page
+STORED_HEADERS = ('Content-Type', 'Content-Language', 'Vary')
+
+
+# Files whose changes alter the rendered HTML
+BUILD_SOURCE_SUFFIXES = ('.html', '.py')
+
+_build_version = None
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def build_version():
+    """
+    ``PAGE_CACHE_BUILD_VERSION`` if set (e.g. the deployed commit), otherwise a
+    hash of the template and core code files with their mtimes. Computed once
+    per process; every worker of one deploy gets the same value.
+    """
+    global _build_version
+    if _build_version is None:
+        configured = getattr(settings, 'PAGE_CACHE_BUILD_VERSION', None)
+        if configured:
+            _build_version = str(configured)
+        else:
+            roots = [str(path) for engine in settings.TEMPLATES for path in engine.get('DIRS', [])]
+            roots.append(os.path.dirname(os.path.abspath(__file__)))
+            digest = hashlib.md5()
+            for root in roots:
+                for directory, dirs, files in os.walk(root):
+                    dirs.sort()
+                    for name in sorted(files):
+                        if name.endswith(BUILD_SOURCE_SUFFIXES):
+                            path = os.path.join(directory, name)
+                            digest.update(f'{path}:{os.stat(path).st_mtime_ns}'.encode('utf-8'))
+            _build_version = digest.hexdigest()[:12]
+    return _build_version
+
+
+def content_version():
+    """Current global content version, created on first use."""
+    cache = _cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        # add() so two workers starting together agree on one value
+        if not cache.add(VERSION_KEY, version, None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def bump_version():
+    """Invalidate every cached page once the current transaction commits."""
+    transaction.on_commit(lambda: _cache().set(VERSION_KEY, time.time_ns(), None))
+
+
+def page_key(request, version, params=()):
+    """Key of the page for ``request.path`` and its ``params`` query values."""
+    query = urlencode(sorted((name, value) for name in params for value in request.GET.getlist(name)))
+    digest = hashlib.md5(f'{request.path}?{query}'.encode('utf-8')).hexdigest()
+    return f'page:{build_version()}:{version}:{digest}'
+
+
+def page_etag(content):
+    return quote_etag(hashlib.md5(build_version().encode('utf-8') + content).hexdigest())
+
+
+def is_cacheable(request, params=()):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if any(name not in params and name not in IGNORED_PARAMS for name in request.GET):
+        return False
+    # Anyone with a session (admin users) gets a freshly rendered page
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def _validated(request, response, etag, last_modified):
+    """Attach the entry's validators; a matching conditional request gets a 304."""
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+
+
+def cache_public_page(view_func=None, *, params=()):
+    """
+    Serve, store and validate anonymous GET responses of ``view_func`` by
+    content version. ``params`` lists the query parameters the view reads.
+    """
+    if view_func is None:
+        return lambda func: cache_public_page(func, params=params)
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not is_cacheable(request, params):
+            return view_func(request, *args, **kwargs)
+
+        cache = _cache()
+        key = page_key(request, content_version(), params)
+        cached = cache.get(key)
+        if cached is not None:
+            content, headers, etag, last_modified = cached
+            response = HttpResponse(content)
+            for name, value in headers.items():
+                response[name] = value
+            return _validated(request, response, etag, last_modified)
+
+        response = view_func(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            headers = {name: response[name] for name in STORED_HEADERS if response.has_header(name)}
+            etag, last_modified = page_etag(response.content), int(time.time())
+            cache.set(key, (response.content, headers, etag, last_modified), CACHE_TIMEOUT)
+            return _validated(request, response, etag, last_modified)
+        return response
+
+    return wrapper
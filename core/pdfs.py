@@ -0,0 +1,149 @@
+"""
+Metadata and text of uploaded journal PDFs.
+
+``inspect_pdf`` opens a PDF with pypdfium2 and returns its page count and a
+JPEG rendering of the first page. The result is stored on ``JournalIssue``
+when the PDF is uploaded (and by the ``backfill_journal_metadata`` command),
+so listings never open the PDF itself. pypdfium2 is optional: without it
+only the file size is recorded.
+
+``extract_text`` reads the text of a range of pages with the pure-Python
+pypdf library; the ``extract_journal_text`` command runs it over page
+chunks in a process pool and stores one ``JournalPage`` row per page.
+"""
+import logging
+import re
+from io import BytesIO
+
+from django.conf import settings
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+
+logger = logging.getLogger(__name__)
+
+COVER_WIDTH = getattr(settings, 'JOURNAL_COVER_WIDTH', 640)
+COVER_QUALITY = getattr(settings, 'JOURNAL_COVER_QUALITY', 85)
+
+
+# Pages handed to one extraction task
+TEXT_CHUNK_PAGES = getattr(settings, 'JOURNAL_TEXT_CHUNK_PAGES', 16)
+
+# Words hyphenated across a line break, and runs of whitespace
+_HYPHEN_BREAK_RE = re.compile(r'(\w)-\s*\n\s*(\w)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+def is_available():
+    return pdfium is not None
+
+
+def text_available():
+    return pypdf is not None
+
+
+def pdf_source(file):
+    """
+    Return something pypdfium2 can open for ``file``: a path on disk when
+    there is one (upload temp file or local storage), otherwise its bytes.
+    """
+    if not getattr(file, '_committed', True):
+        # A FieldFile whose upload isn't stored yet: read the upload itself
+        file = file.file
+    if hasattr(file, 'temporary_file_path'):
+        return file.temporary_file_path()
+    try:
+        return file.path
+    except (AttributeError, NotImplementedError, ValueError):
+        pass
+    file.open('rb')
+    try:
+        file.seek(0)
+        return file.read()
+    finally:
+        file.seek(0)
+
+
+def render_cover(page, width=COVER_WIDTH):
+    """Render a pdfium page to JPEG bytes, ``width`` pixels wide."""
+    bitmap = page.render(scale=width / page.get_width())
+    try:
+        image = bitmap.to_pil().convert('RGB')
+    finally:
+        bitmap.close()
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=COVER_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def inspect_pdf(source, cover=True):
+    """
+    Return ``(page_count, cover_jpeg)`` for a PDF path or bytes.
+
+    ``cover_jpeg`` is None when not requested or the PDF has no pages; both
+    are None when pypdfium2 is missing or the file can't be read.
+    """
+    if pdfium is None:
+        return None, None
+    try:
+        document = pdfium.PdfDocument(source)
+    except (pdfium.PdfiumError, OSError, ValueError) as exc:
+        logger.warning("Could not open PDF %s: %s", source if isinstance(source, str) else '<bytes>', exc)
+        return None, None
+    try:
+        page_count = len(document)
+        if not cover or not page_count:
+            return page_count, None
+        page = document[0]
+        try:
+            return page_count, render_cover(page)
+        except (pdfium.PdfiumError, OSError, ValueError) as exc:
+            logger.warning("Could not render the first PDF page: %s", exc)
+            return page_count, None
+        finally:
+            page.close()
+    finally:
+        document.close()
+
+
+def _reader(source):
+    return pypdf.PdfReader(BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def clean_text(text):
+    """Join hyphenated line breaks and collapse whitespace of extracted page text."""
+    text = _HYPHEN_BREAK_RE.sub(r'\1\2', text.replace('\x00', ''))
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def count_pages(source):
+    """Page count of a PDF path or bytes, read with pypdf."""
+    return len(_reader(source).pages)
+
+
+def extract_text(source, start, stop):
+    """
+    Return ``[(page_number, text)]`` for the 0-based pages ``start``..``stop - 1``
+    of a PDF path or bytes. Page numbers are 1-based; pages without text
+    (scans, blank pages) or that pypdf can't parse are left out.
+    """
+    reader = _reader(source)
+    pages = []
+    for index in range(start, min(stop, len(reader.pages))):
+        try:
+            text = clean_text(reader.pages[index].extract_text() or '')
+        except Exception as exc:
+            # pypdf raises many error types on damaged content streams
+            logger.warning("Could not extract text of page %s: %s", index + 1, exc)
+            continue
+        if text:
+            pages.append((index + 1, text))
+    return pages
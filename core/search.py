@@ -0,0 +1,283 @@
+"""
+Full-text search index for the certificate registry, student records and
+the text of journal pages.
+
+SQLite uses an FTS5 virtual table per model, PostgreSQL a side table with a
+``tsvector`` column and a GIN index. Both are keyed by the model's primary
+key and filled straight from the model table with ``INSERT ... SELECT``.
+The tables are created after ``migrate`` (see ``apps.CoreConfig.ready``).
+
+Only the precomputed ``search_text`` column is indexed; queries go through
+the same ``to_search_form`` normalization before they are matched.
+"""
+import re
+
+from django.db import DatabaseError, connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import JournalPage, Listener, StudentTrainingRecord
+from .transliteration import search_form_offsets, to_search_form
+
+
+# model -> columns that are indexed (same order on every backend)
+SEARCH_FIELDS = {
+    Listener: ['search_text'],
+    StudentTrainingRecord: ['search_text'],
+    JournalPage: ['search_text'],
+}
+
+# model -> certificate number field; numbers typed in a search also match its end
+NUMBER_FIELDS = {
+    Listener: 'number',
+}
+
+BATCH_SIZE = 500
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# alias -> bool, whether the index tables exist on that connection
+_available = {}
+
+
+def _connection(model):
+    return connections[router.db_for_write(model)]
+
+
+def _table(model, connection):
+    suffix = 'fts' if connection.vendor == 'sqlite' else 'search'
+    return f"{model._meta.db_table}_{suffix}"
+
+
+def _supported(connection):
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def is_enabled(model):
+    """True when the index tables for ``model`` exist on its database."""
+    connection = _connection(model)
+    if not _supported(connection):
+        return False
+    if connection.alias not in _available:
+        try:
+            tables = set(connection.introspection.table_names())
+        except DatabaseError:
+            return False
+        _available[connection.alias] = all(_table(m, connection) in tables for m in SEARCH_FIELDS)
+    return _available[connection.alias]
+
+
+def ensure_tables(using='default'):
+    """
+    Create the index tables if missing, backfill ``search_text`` and rebuild
+    every index that is new or had rows backfilled.
+    """
+    connection = connections[using]
+    if not _supported(connection):
+        for model in SEARCH_FIELDS:
+            backfill_search_text(model)
+        return
+    existing = set(connection.introspection.table_names())
+    qn = connection.ops.quote_name
+    created = []
+    for model, fields in SEARCH_FIELDS.items():
+        table = _table(model, connection)
+        if table in existing:
+            if connection.vendor != 'sqlite' or _fts_columns(connection, table) == fields:
+                continue
+            # Indexed columns changed: FTS5 tables can't be altered, recreate it
+            with connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {qn(table)}")
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                try:
+                    cursor.execute(
+                        f"CREATE VIRTUAL TABLE {qn(table)} USING fts5("
+                        f"{', '.join(qn(f) for f in fields)}, "
+                        f"tokenize='unicode61 remove_diacritics 2')"
+                    )
+                except DatabaseError:
+                    # SQLite built without FTS5: searches fall back to search_text substrings
+                    break
+            else:
+                cursor.execute(
+                    f"CREATE TABLE {qn(table)} ("
+                    f"id bigint PRIMARY KEY REFERENCES {qn(model._meta.db_table)} (id) ON DELETE CASCADE, "
+                    f"document tsvector NOT NULL)"
+                )
+                cursor.execute(f"CREATE INDEX {qn(table + '_gin')} ON {qn(table)} USING GIN (document)")
+        created.append(model)
+
+    _available.pop(connection.alias, None)
+    for model in SEARCH_FIELDS:
+        if backfill_search_text(model) or model in created:
+            rebuild(model)
+
+
+def _fts_columns(connection, table):
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA table_info({connection.ops.quote_name(table)})")
+        return [row[1] for row in cursor.fetchall()]
+
+
+def _write_search_text(model, rows, changed_only):
+    batch = []
+    written = 0
+    for obj in rows.only('pk', 'search_text', *model.SEARCH_TEXT_FIELDS).iterator(chunk_size=BATCH_SIZE):
+        value = obj.build_search_text()
+        if changed_only and value == obj.search_text:
+            continue
+        obj.search_text = value
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            model.objects.bulk_update(batch, ['search_text'])
+            written += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, ['search_text'])
+        written += len(batch)
+    return written
+
+
+def backfill_search_text(model):
+    """Fill ``search_text`` for rows saved before it existed; returns how many."""
+    return _write_search_text(model, model.objects.filter(search_text=''), changed_only=False)
+
+
+def refresh_search_text(model):
+    """
+    Recompute ``search_text`` of every row, e.g. after ``SEARCH_TEXT_FIELDS``
+    changed; returns how many rows had a different value.
+    """
+    return _write_search_text(model, model.objects.all(), changed_only=True)
+
+
+def _insert_select(model, connection, where=''):
+    qn = connection.ops.quote_name
+    table = qn(_table(model, connection))
+    source = qn(model._meta.db_table)
+    columns = [qn(f) for f in SEARCH_FIELDS[model]]
+    if connection.vendor == 'sqlite':
+        return (
+            f"INSERT INTO {table} (rowid, {', '.join(columns)}) "
+            f"SELECT id, {', '.join(columns)} FROM {source} {where}"
+        )
+    return (
+        f"INSERT INTO {table} (id, document) "
+        f"SELECT id, to_tsvector('simple', concat_ws(' ', {', '.join(columns)})) FROM {source} {where} "
+        f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document"
+    )
+
+
+def rebuild(model):
+    """Re-index every row of ``model``."""
+    if not is_enabled(model):
+        return
+    connection = _connection(model)
+    table = connection.ops.quote_name(_table(model, connection))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(_insert_select(model, connection))
+
+
+def index_objects(model, pks):
+    """(Re)index the given rows, e.g. after save() or a bulk import."""
+    pks = list(pks)
+    if not pks or not is_enabled(model):
+        return
+    connection = _connection(model)
+    table = connection.ops.quote_name(_table(model, connection))
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), BATCH_SIZE):
+            batch = pks[start:start + BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            if connection.vendor == 'sqlite':
+                # FTS5 has no upsert; replace the rows explicitly
+                cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", batch)
+            cursor.execute(_insert_select(model, connection, f"WHERE id IN ({placeholders})"), batch)
+
+
+def remove_objects(model, pks):
+    """Drop deleted rows from the index (PostgreSQL cascades on its own)."""
+    pks = list(pks)
+    if not pks or not is_enabled(model):
+        return
+    connection = _connection(model)
+    if connection.vendor != 'sqlite':
+        return
+    table = connection.ops.quote_name(_table(model, connection))
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", pks)
+
+
+def search_terms(text):
+    return _TERM_RE.findall(to_search_form(text))
+
+
+def _index_match(model, terms):
+    """Primary keys of ``model`` rows whose index holds every term as a word prefix."""
+    connection = _connection(model)
+    table = connection.ops.quote_name(_table(model, connection))
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        sql = f"SELECT rowid FROM {table} WHERE {table} MATCH %s"
+    else:
+        match = ' & '.join(f"{term}:*" for term in terms)
+        sql = f"SELECT id FROM {table} WHERE document @@ to_tsquery('simple', %s)"
+    return RawSQL(sql, [match])
+
+
+def filter_queryset(queryset, text):
+    """
+    Restrict ``queryset`` to rows matching every normalized word of ``text``.
+
+    Uses the full-text index (prefix match) when it exists, otherwise a
+    substring match on ``search_text``. With the index, a number also
+    matches the end of a ``NUMBER_FIELDS`` value, so "831" finds the
+    zero-padded "000831" as the substring search did. Returns None when
+    ``text`` has no usable words, so callers can fall back to their own search.
+    """
+    model = queryset.model
+    terms = search_terms(text)
+    if not terms:
+        return None
+    if not is_enabled(model):
+        for term in terms:
+            queryset = queryset.filter(search_text__contains=term)
+        return queryset
+    number_field = NUMBER_FIELDS.get(model)
+    numbers = [term for term in terms if number_field and term.isdigit()]
+    words = [term for term in terms if term not in numbers]
+    if words:
+        queryset = queryset.filter(pk__in=_index_match(model, words))
+    for number in numbers:
+        queryset = queryset.filter(
+            Q(pk__in=_index_match(model, [number])) | Q(**{f'{number_field}__endswith': number})
+        )
+    return queryset
+
+
+def snippet(text, query, width=200):
+    """
+    About ``width`` characters of ``text`` around the first word of ``query``
+    found in it, or its beginning. Both are compared in their search form, so
+    a query typed in the other script (or without apostrophes) still matches.
+    """
+    form, offsets = search_form_offsets(text)
+    position = -1
+    for word in search_terms(query):
+        found = form.find(word)
+        if found >= 0:
+            position = offsets[found]
+            break
+    start = max(position - width // 3, 0) if position > 0 else 0
+    end = start + width
+    # Don't cut words in half at either end
+    if start:
+        space = text.find(' ', start)
+        start = space + 1 if 0 <= space < start + 20 else start
+    if end < len(text):
+        space = text.rfind(' ', start, end)
+        end = space if space > start else end
+    return ('…' if start else '') + text[start:end].strip() + ('…' if end < len(text) else '')
@@ -0,0 +1,161 @@
+"""Model signal handlers for the core app."""
+from django.apps import apps
+from django.db import transaction
+from django.db.models import FileField
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, fragments, images, page_cache, search, singletons
+from .models import ImportJob, JournalPage, Listener, SingletonModel, StoredFile, StudentTrainingRecord
+from .storage import ContentAddressedStorage
+
+
+# Served through the JSON endpoints or the admin only, never rendered into a cached page
+PAGE_CACHE_EXEMPT = {Listener, StudentTrainingRecord, ImportJob, StoredFile, JournalPage}
+
+
+@receiver(post_save, sender=Listener)
+@receiver(post_save, sender=StudentTrainingRecord)
+@receiver(post_save, sender=JournalPage)
+def update_search_index(sender, instance, **kwargs):
+    search.index_objects(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Listener)
+@receiver(post_delete, sender=StudentTrainingRecord)
+@receiver(post_delete, sender=JournalPage)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_objects(sender, [instance.pk])
+
+
+@receiver(pre_save, sender=Listener)
+@receiver(pre_save, sender=StudentTrainingRecord)
+def remember_counter_key(sender, instance, update_fields=None, **kwargs):
+    """Note the row's yearly counter key before it is overwritten."""
+    if instance._state.adding:
+        instance._counter_key = None
+    elif update_fields is not None and not set(update_fields) & counters.KEY_FIELDS[sender]:
+        # None of the key fields are written, so the stored key can't change
+        instance._counter_key = counters.instance_key(instance)
+    else:
+        instance._counter_key = counters.stored_key(sender, instance.pk)
+
+
+@receiver(post_save, sender=Listener)
+@receiver(post_save, sender=StudentTrainingRecord)
+def update_yearly_counters(sender, instance, **kwargs):
+    counters.apply(counters.move(getattr(instance, '_counter_key', None), counters.instance_key(instance)))
+
+
+@receiver(post_delete, sender=Listener)
+@receiver(post_delete, sender=StudentTrainingRecord)
+def release_yearly_counters(sender, instance, **kwargs):
+    counters.apply(counters.move(counters.instance_key(instance), None))
+
+
+def invalidate_home_sections(sender, **kwargs):
+    fragments.invalidate_for(sender)
+
+
+for _model in {model for models in fragments.SECTION_MODELS.values() for model in models}:
+    post_save.connect(invalidate_home_sections, sender=_model, dispatch_uid=f'home_sections_save_{_model.__name__}')
+    post_delete.connect(invalidate_home_sections, sender=_model, dispatch_uid=f'home_sections_delete_{_model.__name__}')
+
+
+def bump_page_cache_version(sender, **kwargs):
+    page_cache.bump_version()
+
+
+for _model in apps.get_app_config('core').get_models():
+    if _model not in PAGE_CACHE_EXEMPT:
+        post_save.connect(bump_page_cache_version, sender=_model, dispatch_uid=f'page_cache_save_{_model.__name__}')
+        post_delete.connect(bump_page_cache_version, sender=_model, dispatch_uid=f'page_cache_delete_{_model.__name__}')
+
+
+def invalidate_singleton(sender, **kwargs):
+    singletons.invalidate(sender)
+
+
+for _model in apps.get_app_config('core').get_models():
+    if issubclass(_model, SingletonModel):
+        post_save.connect(invalidate_singleton, sender=_model, dispatch_uid=f'singleton_save_{_model.__name__}')
+        post_delete.connect(invalidate_singleton, sender=_model, dispatch_uid=f'singleton_delete_{_model.__name__}')
+
+
+def addressed_file_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def responsive_image_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, images.ResponsiveImageField)]
+
+
+def release_stored_file(storage, name):
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+def release_derivatives(storage, name):
+    """Delete the derivatives of ``name`` once no row can be using them."""
+    def delete():
+        # A content-addressed name may still be referenced by other rows (or re-uploaded here)
+        if isinstance(storage, ContentAddressedStorage) and storage.exists(name):
+            return
+        images.delete_derivatives(storage, name)
+    transaction.on_commit(delete)
+
+
+def release_stored_files(sender, instance, **kwargs):
+    """Drop the deleted row's references to content-addressed files and their derivatives."""
+    addressed = addressed_file_fields(sender)
+    for field in addressed:
+        file = getattr(instance, field.attname)
+        if file:
+            release_stored_file(field.storage, file.name)
+    for field in responsive_image_fields(sender):
+        file = getattr(instance, field.attname)
+        if file:
+            release_derivatives(field.storage, file.name)
+
+
+def remember_stored_files(sender, instance, update_fields=None, **kwargs):
+    """Note the file names stored on the row before a save can replace them."""
+    instance._replaced_files = {}
+    addressed = addressed_file_fields(sender)
+    tracked = addressed + [field for field in responsive_image_fields(sender) if field not in addressed]
+    fields = [field for field in tracked if update_fields is None or field.attname in update_fields]
+    if instance._state.adding or not fields:
+        return
+    row = sender._default_manager.filter(pk=instance.pk).values_list(*[field.attname for field in fields]).first()
+    for field, stored in zip(fields, row or ()):
+        file = getattr(instance, field.attname)
+        # A new upload adds its own reference even when its content (and name) is the same
+        uploading = field in addressed and bool(file) and not file._committed
+        if stored and (uploading or stored != (file.name if file else None)):
+            instance._replaced_files[field.attname] = stored
+
+
+def release_replaced_files(sender, instance, **kwargs):
+    """Drop the references and derivatives of files that a save replaced or cleared."""
+    for attname, name in getattr(instance, '_replaced_files', {}).items():
+        field = sender._meta.get_field(attname)
+        if isinstance(field.storage, ContentAddressedStorage):
+            release_stored_file(field.storage, name)
+        if isinstance(field, images.ResponsiveImageField):
+            release_derivatives(field.storage, name)
+    instance._replaced_files = {}
+
+
+for _model in apps.get_app_config('core').get_models():
+    if any(isinstance(field, FileField) for field in _model._meta.concrete_fields):
+        # The storage is checked per call, as settings may swap it
+        pre_save.connect(remember_stored_files, sender=_model, dispatch_uid=f'stored_files_remember_{_model.__name__}')
+        post_save.connect(release_replaced_files, sender=_model, dispatch_uid=f'stored_files_replace_{_model.__name__}')
+        post_delete.connect(release_stored_files, sender=_model, dispatch_uid=f'stored_files_delete_{_model.__name__}')
+
+
+def create_search_tables(sender, using='default', **kwargs):
+    """post_migrate: the FTS tables are not Django models, so create them here."""
+    search.ensure_tables(using)
@@ -0,0 +1,71 @@
+"""
+Process-local cache for the single-row models (Statistics, AppContent, ...).
+
+Each process loads a singleton once and keeps a frozen snapshot of it. A
+version stamp per model lives in a shared cache; saving or deleting the row
+replaces the stamp, and every process reloads on its next read when its
+stamp no longer matches. Reads never create the row: a missing row yields an
+unsaved instance with the field defaults.
+"""
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+CACHE_ALIAS = getattr(settings, 'SINGLETON_CACHE_ALIAS', 'default')
+
+SINGLETON_PK = 1
+
+# model label -> (stamp, snapshot)
+_snapshots = {}
+_lock = threading.Lock()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _stamp_key(model):
+    return f'singleton:{model._meta.label_lower}'
+
+
+def _current_stamp(model):
+    cache = _cache()
+    key = _stamp_key(model)
+    stamp = cache.get(key)
+    if stamp is None:
+        # First reader (or a cleared cache) publishes a stamp; add() keeps a concurrent one
+        stamp = uuid.uuid4().hex
+        if not cache.add(key, stamp, None):
+            stamp = cache.get(key, stamp)
+    return stamp
+
+
+def _load(model):
+    instance = model.objects.filter(pk=SINGLETON_PK).first()
+    if instance is None:
+        instance = model(pk=SINGLETON_PK)
+    instance._frozen = True
+    return instance
+
+
+def get(model):
+    """Return the frozen snapshot of ``model``'s row, reloading it if the stamp changed."""
+    label = model._meta.label_lower
+    stamp = _current_stamp(model)
+    cached = _snapshots.get(label)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with _lock:
+        snapshot = _load(model)
+        _snapshots[label] = (stamp, snapshot)
+    return snapshot
+
+
+def invalidate(model):
+    """Publish a new stamp once the current transaction commits."""
+    key = _stamp_key(model)
+    transaction.on_commit(lambda: _cache().set(key, uuid.uuid4().hex, None))
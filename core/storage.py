@@ -0,0 +1,110 @@
+"""
+Content-addressed media storage (optional).
+
+Enable with ``DJANGO_CONTENT_ADDRESSED_MEDIA=1``. Uploads (names under
+``uploads/``, as produced by ``generate_unique_filename``) are stored as
+``cas/<aa>/<bb>/<sha256><ext>``: identical files share one copy, and a name
+never changes content, so it can be served as immutable. Every save of an
+upload adds a reference in ``StoredFile``; ``delete()`` drops one and only
+removes the file when none are left. Rows release their references when
+they are deleted or their file is replaced (see ``signals``). Other names (image derivatives, ...)
+are stored as usual.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+
+CAS_DIR = 'cas'
+
+
+def content_hash(content):
+    """SHA-256 hex digest of a Django ``File``, read in chunks; the position is reset."""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # Names that are stored by content hash
+    addressed_prefixes = ('uploads/',)
+
+    def is_addressed(self, name):
+        return name.replace('\\', '/').startswith(self.addressed_prefixes)
+
+    @staticmethod
+    def is_content_addressed(name):
+        return name.replace('\\', '/').startswith(f'{CAS_DIR}/')
+
+    def hashed_name(self, name, content):
+        value = content_hash(content)
+        ext = os.path.splitext(name)[1].lower()
+        return f'{CAS_DIR}/{value[:2]}/{value[2:4]}/{value}{ext}'
+
+    def get_available_name(self, name, max_length=None):
+        if self.is_addressed(name):
+            # _save() replaces the name with the content hash anyway
+            return name
+        return super().get_available_name(name, max_length=max_length)
+
+    def _save(self, name, content):
+        if not self.is_addressed(name):
+            return super()._save(name, content)
+        target = self.hashed_name(name, content)
+        if not self.exists(target):
+            self.write_addressed(target, content)
+        self.add_reference(target)
+        return target
+
+    def write_addressed(self, name, content):
+        """
+        Write ``content`` to a temporary file and rename it to ``name``. A file
+        already there (stored concurrently) has the same bytes, so it is simply
+        replaced instead of saving a suffixed copy, and no reader ever sees a
+        partly written file.
+        """
+        path = self.path(name)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+        try:
+            with os.fdopen(handle, 'wb') as target:
+                for chunk in content.chunks():
+                    target.write(chunk)
+            # mkstemp creates the file readable by its owner only
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def add_reference(self, name):
+        from .models import StoredFile
+
+        with transaction.atomic():
+            StoredFile.objects.get_or_create(name=name)
+            StoredFile.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+    def delete(self, name):
+        if not self.is_content_addressed(name):
+            return super().delete(name)
+
+        from .models import StoredFile
+
+        with transaction.atomic():
+            record = StoredFile.objects.select_for_update().filter(name=name).first()
+            if record is not None and record.ref_count > 1:
+                StoredFile.objects.filter(pk=record.pk).update(ref_count=F('ref_count') - 1)
+                return
+            if record is not None:
+                record.delete()
+        super().delete(name)
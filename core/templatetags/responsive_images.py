@@ -0,0 +1,34 @@
+"""``{% responsive_image %}``: a <picture> with WebP/JPEG srcsets for a ResponsiveImageField file."""
+from django import template
+from django.utils.html import format_html
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(file, alt='', sizes='100vw', css_class='', loading='lazy'):
+    """
+    Render ``file`` as ``<picture>`` with WebP and JPEG sources. ``sizes``
+    should describe the rendered width so the browser picks a small file.
+    """
+    if not file:
+        return ''
+    dimensions = getattr(file, 'stored_dimensions', None)
+    # Intrinsic size lets the browser reserve the box before the image loads
+    size_attrs = format_html(' width="{}" height="{}"', *dimensions) if dimensions else ''
+    if not getattr(file, 'has_derivatives', False):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}"{}>',
+            file.url, alt, css_class, loading, size_attrs,
+        )
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<source type="image/jpeg" srcset="{}" sizes="{}">'
+        '<img src="{}" alt="{}" class="{}" loading="{}"{}>'
+        '</picture>',
+        file.srcset_webp, sizes,
+        file.srcset_jpeg, sizes,
+        file.fallback_url, alt, css_class, loading, size_attrs,
+    )
@@ -0,0 +1,595 @@
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import BytesIO
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook, load_workbook
+from PIL import Image
+
+from . import (
+    bundles, counters, embeds, exporters, file_serving, images, import_normalization, importers, search,
+    transliteration,
+)
+from .management.commands import backfill_journal_metadata
+from .models import (
+    ArtGalleryImage, ArtGalleryItem, Document, GalleryImage, GalleryItem, ImportJob, JournalIssue, Listener, News,
+    InternationalRelation, InternationalVideo, NewsImage, Statistics, StoredFile, StudentTrainingRecord,
+    YearlyStatistics, student_record_key,
+)
+
+
+class VerifyCertificateTests(TestCase):
+
+    def test_exact_number_wins_over_zero_padded_one(self):
+        Listener.objects.create(record_type='MO', full_name="To'ldirilgan", number='000831')
+        Listener.objects.create(record_type='MO', full_name="Aniq", number='831')
+
+        response = self.client.get(reverse('verify_certificate'), {'type': 'MO', 'number': '831'})
+
+        self.assertTrue(response.json()['found'])
+        self.assertEqual(response.json()['listener']['number'], '831')
+        self.assertEqual(response.json()['listener']['full_name'], "Aniq")
+
+    def test_zero_padded_number_is_found_without_exact_match(self):
+        Listener.objects.create(record_type='MO', full_name="To'ldirilgan", number='000831')
+
+        response = self.client.get(reverse('verify_certificate'), {'type': 'MO', 'number': '831'})
+
+        self.assertEqual(response.json()['listener']['number'], '000831')
+
+
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+    for alias in ('default', 'shared', 'pages')
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PageCacheValidatorTests(TestCase):
+
+    def test_cache_hit_answers_conditional_request_without_queries(self):
+        first = self.client.get(reverse('journal'))
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first.has_header('ETag'))
+
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('journal'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_unknown_query_parameters_are_not_cached(self):
+        self.client.get(reverse('journal'))
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse('journal'), {'utm_source': 'telegram'})
+        with self.assertNumQueries(1):
+            self.client.get(reverse('journal'), {'x': '1'})
+        with self.assertNumQueries(1):
+            self.client.get(reverse('journal'), {'x': '1'})
+
+    def test_etag_changes_with_content(self):
+        first = self.client.get(reverse('journal'))
+        # The version bump runs on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            JournalIssue.objects.create(year='2024', issue_number='1', pdf_file='uploads/journalissue/a.pdf')
+
+        second = self.client.get(reverse('journal'), HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second['ETag'], first['ETag'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class HomeQueryCountTests(TestCase):
+    """The home page runs a fixed number of queries however many cards it shows."""
+
+    def add_content(self, count):
+        image = {'image': 'uploads/test.jpg', 'image_width': 10, 'image_height': 10}
+        for index in range(count):
+            news = News.objects.create(title=f"Yangilik {index}", content="Matn")
+            NewsImage.objects.create(news=news, **image)
+            album = GalleryItem.objects.create(
+                title=f"Albom {index}", cover_image='uploads/test.jpg', cover_image_width=10, cover_image_height=10,
+            )
+            GalleryImage.objects.bulk_create([GalleryImage(gallery=album, order=order, **image) for order in range(3)])
+            art = ArtGalleryItem.objects.create(name=f"Asar {index}", author_full_name="Muallif", text="Matn", **image)
+            ArtGalleryImage.objects.bulk_create([ArtGalleryImage(art_item=art, order=order, **image) for order in range(3)])
+
+    def render_home(self):
+        # Neither the page cache nor the section fragments may answer
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_query_count_does_not_grow_with_content(self):
+        self.add_content(1)
+        self.render_home()  # warm process-local snapshots
+        with CaptureQueriesContext(connection) as single:
+            self.render_home()
+
+        self.add_content(10)
+        with self.assertNumQueries(len(single)):
+            response = self.render_home()
+        self.assertEqual(len(response.context['news_list']), 8)
+        self.assertEqual(len(response.context['gallery']), 11)
+
+
+class TempMediaMixin:
+    """Store uploads of the test in a temporary MEDIA_ROOT."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+
+class ImportJobTests(TempMediaMixin, TestCase):
+
+    def create_job(self, **kwargs):
+        sheet = SimpleUploadedFile('tinglovchilar.csv', "F.I.SH,Raqami\nAliyev Ali,831\n".encode('utf-8'))
+        return ImportJob.objects.create(kind=ImportJob.KIND_LISTENER, record_type='MO', file=sheet, **kwargs)
+
+    def test_finished_job_deletes_its_upload(self):
+        job = self.create_job()
+        storage, name = job.file.storage, job.file.name
+        self.assertTrue(storage.exists(name))
+
+        importers.run_import_job(importers.claim_next_job())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_DONE)
+        self.assertEqual(job.created_count, 1)
+        self.assertFalse(job.file)
+        self.assertFalse(storage.exists(name))
+
+    def test_job_without_progress_is_failed(self):
+        stale = self.create_job(status=ImportJob.STATUS_RUNNING)
+        storage, name = stale.file.storage, stale.file.name
+        silent_since = timezone.now() - timedelta(seconds=importers.STALE_JOB_TIMEOUT + 60)
+        ImportJob.objects.filter(pk=stale.pk).update(updated_at=silent_since)
+        running = self.create_job(status=ImportJob.STATUS_RUNNING)
+
+        self.assertEqual(importers.reap_stale_jobs(), 1)
+
+        stale.refresh_from_db()
+        running.refresh_from_db()
+        self.assertEqual(stale.status, ImportJob.STATUS_FAILED)
+        self.assertTrue(stale.error)
+        self.assertFalse(storage.exists(name))
+        self.assertEqual(running.status, ImportJob.STATUS_RUNNING)
+
+
+class ListenerImportTests(TestCase):
+
+    headers = ['F.I.SH', 'Asosiy ish joyi', 'Raqami']
+
+    def import_rows(self, rows, headers=None, chunk_size=importers.CHUNK_SIZE):
+        mapping = importers.resolve_columns(headers or self.headers, importers.LISTENER_COLUMNS)
+        importer = importers.ListenerImporter('MO')
+        for frame in importers.iter_frames(rows, mapping, chunk_size):
+            importer.import_frame(frame)
+        return importer.counts
+
+    def test_reimporting_a_sheet_updates_its_rows(self):
+        self.import_rows([("Aliyev Ali", "1-maktab", "831"), ("Karimova Nodira", "2-maktab", "832")])
+
+        counts = self.import_rows([("Aliyev Ali", "5-litsey", "831"), ("Karimova Nodira", "2-maktab", "832")])
+
+        self.assertEqual(counts, {'created': 0, 'updated': 2, 'skipped': 0})
+        self.assertEqual(Listener.objects.count(), 2)
+        self.assertEqual(Listener.objects.get(number='831').workplace, "5-litsey")
+
+    def test_streamed_workbook_is_imported_across_chunks(self):
+        workbook = Workbook()
+        workbook.active.append(self.headers)
+        for row in [("Aliyev Ali", "1-maktab", 831), ("Karimova Nodira", "2-maktab", 832), ("Soliyev Bek", "", None)]:
+            workbook.active.append(row)
+        buffer = BytesIO()
+        workbook.save(buffer)
+        upload = SimpleUploadedFile('tinglovchilar.xlsx', buffer.getvalue())
+
+        with importers.open_sheet(upload) as (headers, rows):
+            counts = self.import_rows(rows, headers, chunk_size=2)
+
+        self.assertEqual(counts, {'created': 3, 'updated': 0, 'skipped': 0})
+        # Rows without a number are numbered by their place in the file, not in the chunk
+        self.assertEqual(
+            sorted(Listener.objects.values_list('number', 'full_name')),
+            [('000003', "Soliyev Bek"), ('831', "Aliyev Ali"), ('832', "Karimova Nodira")],
+        )
+
+
+class ListenerExportTests(TestCase):
+
+    def setUp(self):
+        Listener.objects.create(record_type='MO', full_name="Aliyev Ali", workplace="1-maktab", number='831')
+        Listener.objects.create(record_type='QT', full_name="Karimova Nodira", number='832')
+
+    def test_every_format_streams_the_header_and_rows(self):
+        label = dict(Listener.RECORD_TYPE_CHOICES)['MO']
+
+        response = exporters.export_listeners('MO', 'csv')
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(lines[0], "F.I.SH,Ish joyi,Yo'nalish,Seriya,Raqam,O'qish muddati (davri),Turi")
+        self.assertEqual(lines[1:], [f"Aliyev Ali,1-maktab,,MO,831,,{label}"])
+
+        response = exporters.export_listeners('MO', 'ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(records), 1)
+        self.assertEqual((records[0]['full_name'], records[0]['number']), ("Aliyev Ali", '831'))
+
+        response = exporters.export_listeners(None, 'xlsx')
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content)), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], 'F.I.SH')
+        self.assertEqual(sorted(row[4] for row in rows[1:]), ['831', '832'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SingletonTests(TestCase):
+
+    def test_snapshot_is_read_only_and_reloaded_after_a_save(self):
+        snapshot = Statistics.get_instance()
+        self.assertEqual(snapshot.professors, 0)
+        self.assertFalse(Statistics.objects.exists())
+        with self.assertRaises(AttributeError):
+            snapshot.professors = 5
+        with self.assertRaises(TypeError):
+            snapshot.save()
+
+        with self.assertNumQueries(0):
+            self.assertIs(Statistics.get_instance(), snapshot)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Statistics.objects.create(pk=1, professors=5)
+
+        self.assertEqual(Statistics.get_instance().professors, 5)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class YearlyCounterTests(TestCase):
+
+    def stored_counts(self):
+        return {
+            year: counts
+            for year, *counts in YearlyStatistics.objects.values_list('year', *counters.COUNTER_FIELDS.values())
+            if any(counts)
+        }
+
+    def assertCountsMatchRebuild(self):
+        incremental = self.stored_counts()
+        counters.rebuild()
+        self.assertEqual(incremental, self.stored_counts())
+
+    def test_incremental_counters_match_a_rebuild(self):
+        listener = Listener.objects.create(
+            record_type='MO', full_name="Aliyev Ali", number='831', duration="2022-2023",
+        )
+        retrained = Listener.objects.create(
+            record_type='QT', full_name="Karimova Nodira", number='832', duration="2024",
+        )
+        record = StudentTrainingRecord.objects.create(full_name="Soliyev Bek", training_time="2023 yil mart")
+        self.assertEqual(self.stored_counts(), {'2023': [1, 0, 1], '2024': [0, 1, 0]})
+        self.assertCountsMatchRebuild()
+
+        listener.duration = "2024"
+        listener.save()
+        retrained.delete()
+        record.is_active = False
+        record.save()
+        self.assertEqual(self.stored_counts(), {'2024': [1, 0, 0]})
+        self.assertCountsMatchRebuild()
+
+        importer = importers.ListenerImporter('QT')
+        importer.import_frame(import_normalization.build_frame(
+            [("Karimova Nodira", "833", "2021"), ("Soliyev Bek", "834", "2025")],
+            {0: 'full_name', 1: 'number', 2: 'duration'},
+        ))
+        self.assertEqual(self.stored_counts(), {'2021': [0, 1, 0], '2024': [1, 0, 0], '2025': [0, 1, 0]})
+        self.assertCountsMatchRebuild()
+
+
+class ImportNormalizationTests(SimpleTestCase):
+
+    mapping = {0: 'full_name', 1: 'workplace', 2: 'number'}
+
+    def test_repeated_numbers_merge_with_later_cells_winning(self):
+        frame = import_normalization.build_frame(
+            [("Aliyev Ali", "1-maktab", "831"), ("Aliyev Alisher", None, "831")], self.mapping,
+        )
+
+        merged, skipped, repeats = import_normalization.normalize_listener_frame(frame, 'MO')
+
+        self.assertEqual((skipped, repeats), (0, 1))
+        self.assertEqual(merged.loc['831', 'full_name'], "Aliyev Alisher")
+        # An empty cell in the later row keeps the earlier value
+        self.assertEqual(merged.loc['831', 'workplace'], "1-maktab")
+
+    def test_whole_float_cells_are_read_as_integers(self):
+        frame = import_normalization.build_frame([("Aliyev Ali", 12.5, 831.0)], self.mapping)
+
+        self.assertEqual(frame.loc[0, 'number'], "831")
+        self.assertEqual(frame.loc[0, 'workplace'], "12.5")
+
+    def test_natural_keys_match_the_model_key(self):
+        rows = [("  Aliyev   Ali ", "1-MAKTAB", "Informatika\tfani"), ("Ерназаров Ёрқин", None, "Straße")]
+        frame = import_normalization.build_frame(rows, {0: 'full_name', 1: 'workplace', 2: 'course_name'})
+
+        frame, _ = import_normalization.normalize_student_frame(frame)
+
+        for (full_name, workplace, course_name), key in zip(rows, frame['natural_key']):
+            self.assertEqual(key, student_record_key(full_name, workplace or '', course_name))
+
+
+@override_settings(DEFAULT_FILE_STORAGE='core.storage.ContentAddressedStorage')
+class ContentAddressedStorageTests(TempMediaMixin, TestCase):
+
+    def upload(self, content):
+        return SimpleUploadedFile('hujjat.pdf', content)
+
+    def ref_counts(self):
+        return dict(StoredFile.objects.values_list('name', 'ref_count'))
+
+    def test_replacing_a_file_releases_the_old_reference(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            document = Document.objects.create(title="Hujjat", file=self.upload(b'birinchi'))
+            Document.objects.create(title="Nusxa", file=self.upload(b'birinchi'))
+        old_name = document.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            document.file = self.upload(b'ikkinchi')
+            document.save()
+
+        self.assertEqual(self.ref_counts(), {old_name: 1, document.file.name: 1})
+
+    def test_reuploading_the_same_content_keeps_one_reference(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            document = Document.objects.create(title="Hujjat", file=self.upload(b'bir xil'))
+            document.file = self.upload(b'bir xil')
+            document.save()
+
+        self.assertEqual(self.ref_counts(), {document.file.name: 1})
+
+    def test_existing_identical_file_is_reused(self):
+        storage = Document._meta.get_field('file').storage
+        name = storage.hashed_name('uploads/a.pdf', self.upload(b'bir xil'))
+        # Stored by a concurrent upload between the exists() check and the write
+        storage.write_addressed(name, self.upload(b'bir xil'))
+
+        saved = storage._save('uploads/a.pdf', self.upload(b'bir xil'))
+
+        self.assertEqual(saved, name)
+        self.assertEqual(storage.listdir(name.rsplit('/', 1)[0])[1], [name.rsplit('/', 1)[1]])
+
+
+class SearchCoverageTests(TestCase):
+
+    def test_admin_search_fields_are_indexed(self):
+        record = StudentTrainingRecord.objects.create(full_name="Aliyev Ali", training_time="Mart 2024")
+        listener = Listener.objects.create(record_type='QT', full_name="Karimov Vali", number='12')
+
+        self.assertEqual(list(search.filter_queryset(StudentTrainingRecord.objects.all(), "mart")), [record])
+        self.assertEqual(list(search.filter_queryset(Listener.objects.all(), "qt")), [listener])
+
+    def test_number_finds_zero_padded_and_partial_certificates(self):
+        padded = Listener.objects.create(record_type='MO', full_name="Aliyev Ali", number='000831')
+        longer = Listener.objects.create(record_type='QT', full_name="Karimov Vali", number='120831')
+        Listener.objects.create(record_type='MO', full_name="Aliyev Ali", number='000832')
+
+        self.assertTrue(search.is_enabled(Listener))
+        self.assertEqual(set(search.filter_queryset(Listener.objects.all(), "831")), {padded, longer})
+        self.assertEqual(list(search.filter_queryset(Listener.objects.all(), "aliyev 831")), [padded])
+        self.assertEqual(list(search.filter_queryset(Listener.objects.all(), "000831")), [padded])
+
+    def test_refresh_rewrites_text_built_from_older_fields(self):
+        record = StudentTrainingRecord.objects.create(full_name="Aliyev Ali", training_time="Mart 2024")
+        StudentTrainingRecord.objects.filter(pk=record.pk).update(search_text="aliyev ali")
+
+        self.assertEqual(search.refresh_search_text(StudentTrainingRecord), 1)
+        self.assertEqual(search.refresh_search_text(StudentTrainingRecord), 0)
+        record.refresh_from_db()
+        self.assertEqual(record.search_text, record.build_search_text())
+
+
+class ResponsiveImageTests(TempMediaMixin, TestCase):
+
+    def upload(self):
+        buffer = BytesIO()
+        Image.new('RGB', (900, 600), 'red').save(buffer, 'JPEG')
+        return SimpleUploadedFile('rasm.jpg', buffer.getvalue())
+
+    def test_derivatives_are_rendered_for_uploads_only(self):
+        item = GalleryItem.objects.create(title="Albom", cover_image=self.upload())
+        self.assertTrue(item.cover_image_derivatives)
+
+        with mock.patch.object(images, 'generate_derivatives') as generate:
+            item.title = "Yangi nom"
+            item.save()
+            item.cover_image = self.upload()
+            item.save()
+        self.assertEqual(generate.call_count, 1)
+
+    def test_rendering_does_not_ask_the_storage(self):
+        item = GalleryItem.objects.create(title="Albom", cover_image=self.upload())
+        item = GalleryItem.objects.get(pk=item.pk)
+
+        with mock.patch.object(images, 'has_derivatives') as lookup:
+            self.assertTrue(item.cover_image.has_derivatives)
+            self.assertIn('/derivatives/', item.cover_image.display_url)
+        lookup.assert_not_called()
+
+    def test_replaced_and_cleared_images_lose_their_derivatives(self):
+        item = GalleryItem.objects.create(title="Albom", cover_image=self.upload())
+        storage, first = item.cover_image.storage, item.cover_image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.cover_image = self.upload()
+            item.save()
+        second = item.cover_image.name
+        self.assertFalse(storage.exists(images.manifest_name(first)))
+        self.assertFalse(storage.exists(images.derivative_name(first, images.WIDTHS[0], 'webp')))
+        self.assertTrue(storage.exists(images.manifest_name(second)))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            item.cover_image = None
+            item.save()
+        self.assertFalse(storage.exists(images.manifest_name(second)))
+
+
+class DocumentBundleTests(TempMediaMixin, TestCase):
+
+    def test_bundle_is_reused_until_a_document_changes(self):
+        first = Document.objects.create(title="Nizom", file=SimpleUploadedFile('nizom.pdf', b'%PDF-1.4 nizom'))
+        Document.objects.create(title="Reja", file=SimpleUploadedFile('reja.txt', b'ish rejasi'))
+
+        name = bundles.get_bundle('open_data')
+        storage = first.file.storage
+        with zipfile.ZipFile(storage.open(name)) as archive:
+            self.assertEqual(sorted(archive.namelist()), ['Nizom.pdf', 'Reja.txt'])
+            self.assertEqual(archive.read('Reja.txt'), b'ish rejasi')
+
+        with mock.patch.object(bundles, 'write_bundle') as write:
+            self.assertEqual(bundles.get_bundle('open_data'), name)
+        write.assert_not_called()
+
+        first.title = "Nizom (yangi tahrir)"
+        first.save()
+        renamed = bundles.get_bundle('open_data')
+        self.assertNotEqual(renamed, name)
+        with zipfile.ZipFile(storage.open(renamed)) as archive:
+            self.assertIn('Nizom (yangi tahrir).pdf', archive.namelist())
+        # The replaced bundle stays for downloads already under way
+        self.assertTrue(storage.exists(name))
+
+
+class JournalMetadataTests(TempMediaMixin, TestCase):
+
+    def create_issue(self, **fields):
+        issue = JournalIssue.objects.create(year='2024', pdf_file='uploads/journalissue/a.pdf', **fields)
+        issue.pdf_file.storage.save(issue.pdf_file.name, SimpleUploadedFile('a.pdf', b'%PDF-1.4'))
+        return issue
+
+    def cover(self, color):
+        buffer = BytesIO()
+        Image.new('RGB', (300, 400), color).save(buffer, 'JPEG')
+        return buffer.getvalue()
+
+    def test_attempted_issues_are_not_taken_up_again(self):
+        pending = self.create_issue()
+        self.create_issue(file_size=8)
+
+        command = backfill_journal_metadata.Command()
+        command.counts = {'updated': 0, 'missing': 0, 'failed': 0}
+
+        self.assertEqual([issue.pk for issue in command.pending_issues(force=False)], [pending.pk])
+        self.assertEqual(len(list(command.pending_issues(force=True))), 2)
+
+    def test_replaced_generated_cover_is_deleted(self):
+        issue = self.create_issue()
+        issue.apply_pdf_metadata(8, 1, self.cover('red'))
+        issue.save()
+        storage, first = issue.thumbnail.storage, issue.thumbnail.name
+
+        issue = JournalIssue.objects.get(pk=issue.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            issue.apply_pdf_metadata(8, 1, self.cover('blue'))
+            issue.save()
+
+        self.assertNotEqual(issue.thumbnail.name, first)
+        self.assertFalse(storage.exists(first))
+        self.assertTrue(storage.exists(issue.thumbnail.name))
+
+
+class SnippetTests(SimpleTestCase):
+
+    text = ("Kirish so'zi. " * 30) + "Ўзбекистон Республикаси Олий Мажлиси қарори билан тасдиқланган. " + ("Xulosa. " * 30)
+
+    def test_query_in_the_other_script_is_found(self):
+        self.assertIn("Ўзбекистон", search.snippet(self.text, "o‘zbekiston"))
+
+    def test_query_without_apostrophes_is_found(self):
+        text = ("Muqaddima. " * 30) + "Qoraqalpog‘iston hududida o‘tkazildi."
+        self.assertIn("Qoraqalpog‘iston", search.snippet(text, "qoraqalpogiston"))
+
+    def test_offsets_follow_the_search_form(self):
+        for value in ["  O‘zbekiston  Respublikasi ", "Ерназар ва Еркин, ёлка", "Straße ' x", "a\n\tb", "1е _е"]:
+            form, offsets = transliteration.search_form_offsets(value)
+            self.assertEqual(form, transliteration.to_search_form(value))
+            self.assertEqual(len(offsets), len(form))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class VideoFacadeTests(TestCase):
+
+    def test_title_cannot_break_out_of_the_inner_document(self):
+        relation = InternationalRelation.objects.create(pk=1)
+        InternationalVideo.objects.create(
+            international_relation=relation, title="O'zbek <b>x</b>", video_url='https://youtu.be/dQw4w9WgXcQ',
+        )
+
+        content = self.client.get(reverse('international')).content.decode()
+
+        # Escaped once for the inner document and once more for the srcdoc attribute
+        self.assertIn('alt=&quot;O&amp;#x27;zbek &amp;lt;b&amp;gt;x&amp;lt;/b&amp;gt;&quot;', content)
+        self.assertIn('sandbox="allow-scripts allow-same-origin allow-popups allow-presentation"', content)
+
+    def test_over_long_video_id_is_not_stored_as_an_id(self):
+        video_id, _ = embeds.parse_video('https://youtu.be/' + 'a' * 40)
+        self.assertEqual(video_id, '')
+        self.assertEqual(embeds.parse_video('https://youtu.be/dQw4w9WgXcQ?t=1')[0], 'dQw4w9WgXcQ')
+
+
+class FileServingTests(TempMediaMixin, TestCase):
+
+    def create_document(self, name, content):
+        return Document.objects.create(title="Hujjat", file=SimpleUploadedFile(name, content))
+
+    def test_range_requests_get_partial_content(self):
+        document = self.create_document('hujjat.pdf', b'0123456789')
+        url = reverse('document_file', args=[document.pk])
+
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        response = self.client.get(url, HTTP_RANGE='bytes=20-30')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_suffix_range_of_an_empty_file_is_unsatisfiable(self):
+        self.assertEqual(file_serving.parse_range('bytes=-5', 0), 'unsatisfiable')
+        self.assertEqual(file_serving.parse_range('bytes=-5', 3), (0, 2))
+
+    def test_accel_redirect_quotes_the_name(self):
+        document = self.create_document('hujjat.pdf', b'%PDF-1.4')
+        Document.objects.filter(pk=document.pk).update(file='uploads/document/Низом 2024.pdf')
+        document.file.storage.save('uploads/document/Низом 2024.pdf', SimpleUploadedFile('x', b'%PDF-1.4'))
+
+        with mock.patch.object(file_serving, 'SENDFILE_BACKEND', 'x-accel-redirect'):
+            response = self.client.get(reverse('document_file', args=[document.pk]))
+
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            '/protected-media/uploads/document/%D0%9D%D0%B8%D0%B7%D0%BE%D0%BC%202024.pdf',
+        )
+
+    def test_sendfile_falls_back_to_streaming_without_a_local_path(self):
+        storage = mock.Mock()
+        storage.path.side_effect = NotImplementedError
+        with mock.patch.object(file_serving, 'SENDFILE_BACKEND', 'x-sendfile'):
+            self.assertIsNone(file_serving._sendfile_header(storage, 'uploads/document/hujjat.pdf'))
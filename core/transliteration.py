@@ -0,0 +1,75 @@
+"""
+Search normalization for Uzbek text typed in Latin or Cyrillic script.
+
+``to_search_form`` case-folds, transliterates Cyrillic to Latin and removes
+every apostrophe variant, so "O‘zbekiston", "Oʻzbekiston", "O'zbekiston",
+"Ozbekiston" and "Ўзбекистон" all become "ozbekiston". ``search_form_offsets``
+gives the same form together with the position of each character in the
+original text, for highlighting matches.
+"""
+import re
+
+
+# o', g' and the ъ/ь signs are written with any of these characters
+APOSTROPHES = "'`´‘’ʻʼʹ′"
+
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo',
+    'ж': 'j', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u',
+    'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sh', 'ъ': '',
+    'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya', 'ў': 'o', 'қ': 'q',
+    'ғ': 'g', 'ҳ': 'h',
+}
+
+_VOWELS = 'аеёиоуэюяў'
+# Cyrillic "е" is "ye" at the start of a word and after a vowel (Ерназар -> Yernazar)
+_YE_RE = re.compile(rf'(?<![^\W\d_])е|(?<=[{_VOWELS}])е')
+_LETTER_RE = re.compile(r'[^\W\d_]')
+_APOSTROPHE_RE = re.compile(f"[{re.escape(APOSTROPHES)}]")
+_SPACE_RE = re.compile(r'\s+')
+_TRANSLATE = str.maketrans(CYRILLIC_TO_LATIN)
+
+
+def to_search_form(value):
+    """Return the normalized search form of ``value`` (may be empty)."""
+    text = str(value or '').casefold()
+    if not text:
+        return ''
+    text = _YE_RE.sub('ye', text)
+    text = text.translate(_TRANSLATE)
+    text = _APOSTROPHE_RE.sub('', text)
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def search_text(*values):
+    """Join several field values into one normalized search column."""
+    return ' '.join(part for part in (to_search_form(v) for v in values) if part)
+
+
+def search_form_offsets(value):
+    """
+    Return ``(form, offsets)``: ``to_search_form(value)`` and, for every
+    character of it, the index in ``value`` of the character it came from.
+    """
+    chars = []
+    offsets = []
+    previous = ''
+    for index, char in enumerate(str(value or '')):
+        for folded in char.casefold():
+            if folded.isspace():
+                # Runs of whitespace collapse to one space, none at the start
+                part = ' ' if chars and chars[-1] != ' ' else ''
+            elif folded in APOSTROPHES:
+                part = ''
+            elif folded == 'е' and (not _LETTER_RE.match(previous) or previous in _VOWELS):
+                part = 'ye'
+            else:
+                part = folded.translate(_TRANSLATE)
+            previous = folded
+            chars.extend(part)
+            offsets.extend([index] * len(part))
+    if chars and chars[-1] == ' ':
+        chars.pop()
+        offsets.pop()
+    return ''.join(chars), offsets
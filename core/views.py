@@ -1,18 +1,31 @@
-import re
+import os
+
+from django.db.models import OuterRef, Prefetch, Q, Subquery
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.views.decorators.http import require_GET, require_safe
 
+from . import bundles, embeds, fragments, search
+from .file_serving import serve_file
+from .page_cache import cache_public_page
 from .models import (
     AppContent,
+    ArtGalleryImage,
     ArtGalleryItem,
     CollaborationProject,
     Course,
     Document,
     ForeignPartner,
+    GalleryImage,
     GalleryItem,
     InternationalRelation,
     JournalIssue,
+    JournalPage,
+    JournalSettings,
     Listener,
     News,
+    NewsImage,
     Personnel,
     Statistics,
     StudentTrainingRecord,
@@ -39,66 +52,113 @@ COMMON_CONTEXT = {
 }
 
 
+STUDENTS_PAGE_SIZE = 25
+JOURNAL_SEARCH_LIMIT = 50
+
+
 def base_context(active_page):
     context = dict(COMMON_CONTEXT)
     context["active_page"] = active_page
     return context
 
 
-def to_embed_url(url):
-    value = (url or "").strip()
-    if not value:
-        return ""
+def news_cards(queryset):
+    """
+    Evaluate a News queryset for cards, setting ``card_image`` (the first image
+    file, with its stored size and derivative flag) on each item from
+    subqueries instead of an ``item.images.first`` query per card.
+    """
+    images = NewsImage.objects.filter(news=OuterRef("pk")).order_by("order", "pk")
+    columns = ["image", "image_width", "image_height", "image_derivatives"]
+    items = list(queryset.annotate(**{f"first_{name}": Subquery(images.values(name)[:1]) for name in columns}))
+    for item in items:
+        if item.first_image:
+            image = NewsImage(news=item, **{name: getattr(item, f"first_{name}") for name in columns})
+            item.card_image = image.image
+        else:
+            item.card_image = None
+    return items
+
+
+HOME_CHART_YEARS = 10
+
+# (YearlyStatistics field, legend label, bar colour)
+HOME_CHART_SERIES = [
+    ("professional_development_count", "Malaka oshirish (MO)", "bg-emerald-500"),
+    ("retraining_count", "Qayta tayyorlash (QT)", "bg-blue-500"),
+    ("student_record_count", "Tinglovchi yozuvlari", "bg-amber-400"),
+]
 
-    iframe_src = re.search(r'src=["\']([^"\']+)["\']', value, flags=re.IGNORECASE)
-    if iframe_src:
-        value = iframe_src.group(1).strip()
 
-    value = value.replace("&amp;", "&")
+def yearly_chart(rows):
+    """Bar heights (percent of the largest counter) for the home page chart."""
+    peak = max((getattr(row, field) for row in rows for field, _, _ in HOME_CHART_SERIES), default=0)
+    return [
+        {
+            "year": row.year,
+            "bars": [
+                {
+                    "label": label,
+                    "color": color,
+                    "value": getattr(row, field),
+                    "height": round(getattr(row, field) * 100 / peak) if peak else 0,
+                }
+                for field, label, color in HOME_CHART_SERIES
+            ],
+        }
+        for row in rows
+    ]
 
-    embed_match = re.search(r'youtube(?:-nocookie)?\.com/embed/([A-Za-z0-9_-]{6,})', value, flags=re.IGNORECASE)
-    if embed_match:
-        return f"https://www.youtube.com/embed/{embed_match.group(1)}"
 
-    short_match = re.search(r'youtu\.be/([A-Za-z0-9_-]{6,})', value, flags=re.IGNORECASE)
-    if short_match:
-        return f"https://www.youtube.com/embed/{short_match.group(1)}"
+def home_stats_section():
+    # The counters are kept up to date by core.counters; nothing is recounted here
+    counted = YearlyStatistics.objects.exclude(
+        professional_development_count=0, retraining_count=0, student_record_count=0
+    )
+    yearly_data = list(counted.order_by("-year")[:HOME_CHART_YEARS])[::-1]
+    return {
+        "stats": Statistics.get_instance(),
+        "yearly_data": yearly_data,
+        "yearly_chart": yearly_chart(yearly_data),
+        "chart_series": HOME_CHART_SERIES,
+    }
 
-    watch_match = re.search(r'[?&]v=([A-Za-z0-9_-]{6,})', value, flags=re.IGNORECASE)
-    if watch_match:
-        return f"https://www.youtube.com/embed/{watch_match.group(1)}"
 
-    shorts_match = re.search(r'youtube\.com/shorts/([A-Za-z0-9_-]{6,})', value, flags=re.IGNORECASE)
-    if shorts_match:
-        return f"https://www.youtube.com/embed/{shorts_match.group(1)}"
+def home_news_section():
+    return {
+        "news_list": news_cards(News.objects.filter(is_active=True).order_by("-created_at")[:8]),
+    }
 
-    id_only = re.fullmatch(r'[A-Za-z0-9_-]{11}', value)
-    if id_only:
-        return f"https://www.youtube.com/embed/{value}"
 
-    return value
+def home_teachers_section():
+    return {
+        "teachers": list(Teacher.objects.filter(is_active=True).order_by("order", "full_name")[:12]),
+    }
 
 
-def home(request):
-    stats = Statistics.get_instance()
-    yearly_data = list(YearlyStatistics.objects.all().order_by("year"))
-    listeners = list(
-        Listener.objects.all().values(
-            "id",
-            "record_type",
-            "full_name",
-            "workplace",
-            "course_type",
-            "series",
-            "number",
-            "duration",
-            "is_verified",
-        )
-    )
+def home_courses_section():
+    return {
+        "courses_retraining": list(
+            Course.objects.filter(
+                is_active=True,
+                course_type="retraining",
+            ).order_by("order", "title")
+        ),
+        "courses_pd": list(
+            Course.objects.filter(
+                is_active=True,
+                course_type="professional_development",
+            ).order_by("order", "title")
+        ),
+    }
+
 
+def home_gallery_section():
     gallery = list(
         GalleryItem.objects.filter(is_active=True)
-        .prefetch_related("images")
+        .prefetch_related(
+            Prefetch("images", queryset=GalleryImage.objects.order_by("order", "-created_at"))
+        )
         .order_by("order", "-created_at")
     )
 
@@ -108,20 +168,25 @@ def home(request):
             {
                 "id": item.id,
                 "title": item.title,
-                "cover_image_url": item.cover_image.url if item.cover_image else "",
+                "cover_image_url": item.cover_image.display_url if item.cover_image else "",
                 "images": [
                     {
                         "id": image.id,
-                        "image_url": image.image.url if image.image else "",
+                        "image_url": image.image.display_url if image.image else "",
                     }
-                    for image in item.images.all().order_by("order", "-created_at")
+                    for image in item.images.all()
                 ],
             }
         )
+    return {"gallery": gallery, "gallery_json": gallery_json}
+
 
-    art_items = (
+def home_art_gallery_section():
+    art_items = list(
         ArtGalleryItem.objects.filter(is_active=True)
-        .prefetch_related("images")
+        .prefetch_related(
+            Prefetch("images", queryset=ArtGalleryImage.objects.order_by("order", "-created_at"))
+        )
         .order_by("order", "-created_at")[:8]
     )
     art_gallery_json = []
@@ -132,37 +197,36 @@ def home(request):
                 "name": item.name,
                 "author": item.author_full_name,
                 "text": item.text,
-                "image_url": item.image.url if item.image else "",
+                "image_url": item.image.display_url if item.image else "",
                 "images": [
                     {
                         "id": image.id,
-                        "image_url": image.image.url if image.image else "",
+                        "image_url": image.image.display_url if image.image else "",
                     }
-                    for image in item.images.all().order_by("order", "-created_at")
+                    for image in item.images.all()
                 ],
             }
         )
+    return {"art_gallery": art_items, "art_gallery_json": art_gallery_json}
+
+
+HOME_SECTIONS = {
+    "stats": home_stats_section,
+    "news": home_news_section,
+    "teachers": home_teachers_section,
+    "courses": home_courses_section,
+    "gallery": home_gallery_section,
+    "art_gallery": home_art_gallery_section,
+}
 
+
+@cache_public_page
+def home(request):
     context = base_context("home")
+    for name, build in HOME_SECTIONS.items():
+        context.update(fragments.get_section(name, build))
     context.update(
         {
-            "stats": stats,
-            "yearly_data": yearly_data,
-            "news_list": News.objects.filter(is_active=True).order_by("-created_at")[:8],
-            "teachers": Teacher.objects.filter(is_active=True).order_by("order", "full_name")[:12],
-            "courses_retraining": Course.objects.filter(
-                is_active=True,
-                course_type="retraining",
-            ).order_by("order", "title"),
-            "courses_pd": Course.objects.filter(
-                is_active=True,
-                course_type="professional_development",
-            ).order_by("order", "title"),
-            "gallery": gallery,
-            "gallery_json": gallery_json,
-            "listeners_json": listeners,
-            "art_gallery": art_items,
-            "art_gallery_json": art_gallery_json,
             "useful_links": [
                 {"name": "Masofaviy ta'lim", "url": "https://mt.uzbamalaka.uz/"},
                 {"name": "Badiiy akademiya", "url": "https://art-academy.uz/"},
@@ -174,6 +238,28 @@ def home(request):
     return render(request, "site/home.html", context)
 
 
+@require_GET
+def verify_certificate(request):
+    """Look up a single MO/QT certificate by type and number."""
+    record_type = (request.GET.get("type") or "MO").strip().upper()
+    number = (request.GET.get("number") or "").strip()
+    if record_type not in ("MO", "QT") or not number:
+        return JsonResponse({"found": False, "error": "type va number talab qilinadi"}, status=400)
+
+    fields = ("record_type", "full_name", "workplace", "course_type", "series", "number", "duration", "is_verified")
+    listeners = Listener.objects.filter(record_type=record_type)
+    listener = listeners.filter(number=number).values(*fields).first()
+    padded = number.zfill(6)
+    if listener is None and padded != number:
+        # Imports zero-pad auto-generated numbers, so "831" also finds "000831",
+        # but only when no certificate is numbered exactly "831"
+        listener = listeners.filter(number=padded).values(*fields).first()
+    if listener is None:
+        return JsonResponse({"found": False})
+    return JsonResponse({"found": True, "listener": listener})
+
+
+@cache_public_page
 def about(request):
     context = base_context("about")
     context.update(
@@ -192,12 +278,14 @@ def about(request):
     return render(request, "site/about.html", context)
 
 
+@cache_public_page
 def journal(request):
     context = base_context("journal")
     context["journal_issues"] = JournalIssue.objects.filter(is_active=True).order_by("-year", "-created_at")
     return render(request, "site/journal.html", context)
 
 
+@cache_public_page
 def international(request):
     content = InternationalRelation.get_instance()
     partners = list(ForeignPartner.objects.filter(is_active=True).order_by("order", "organization_name"))
@@ -209,14 +297,14 @@ def international(request):
             "organization_name": item.organization_name,
             "country": item.country,
             "short_info": item.short_info,
-            "image_url": item.image.url if item.image else "",
+            "image_url": item.image.display_url if item.image else "",
         }
         for item in partners
     ]
     photos_json = [
         {
             "id": item.id,
-            "image_url": item.image.url if item.image else "",
+            "image_url": item.image.display_url if item.image else "",
         }
         for item in photos
     ]
@@ -224,7 +312,10 @@ def international(request):
         {
             "id": item.id,
             "title": item.title or "Video",
-            "embed_url": to_embed_url(item.video_url),
+            "embed_url": item.embed_url,
+            "thumbnail_url": item.thumbnail_url,
+            "srcdoc": embeds.facade_srcdoc(item.embed_url, item.thumbnail_url, item.title or "Video")
+            if item.thumbnail_url else "",
             "video_url": item.video_url,
         }
         for item in videos
@@ -245,20 +336,11 @@ def international(request):
     return render(request, "site/international.html", context)
 
 
+@cache_public_page
 def students(request):
-    student_records = list(
-        StudentTrainingRecord.objects.filter(is_active=True).values(
-            "id",
-            "full_name",
-            "workplace",
-            "course_name",
-            "training_time",
-        )
-    )
     context = base_context("students")
     context.update(
         {
-            "students_records_json": student_records,
             "regulatory_docs": Document.objects.filter(is_active=True, category="regulatory").order_by("-created_at"),
             "student_notes": AppContent.get_instance().student_notes,
         }
@@ -266,19 +348,102 @@ def students(request):
     return render(request, "site/students.html", context)
 
 
+@require_GET
+def students_search(request):
+    """Paginated search over active StudentTrainingRecord rows."""
+    query = (request.GET.get("q") or "").strip()
+    try:
+        page = max(int(request.GET.get("page") or 1), 1)
+    except ValueError:
+        page = 1
+    if not query:
+        return JsonResponse({"results": [], "page": 1, "has_next": False})
+
+    records = StudentTrainingRecord.objects.filter(is_active=True)
+    matches = search.filter_queryset(records, query)
+    if matches is None:
+        matches = records.filter(
+            Q(full_name__icontains=query)
+            | Q(workplace__icontains=query)
+            | Q(course_name__icontains=query)
+        )
+
+    offset = (page - 1) * STUDENTS_PAGE_SIZE
+    # One extra row tells whether a next page exists without a COUNT(*) query
+    rows = list(
+        matches.order_by("-created_at", "-id")
+        .values("id", "full_name", "workplace", "course_name", "training_time")[
+            offset:offset + STUDENTS_PAGE_SIZE + 1
+        ]
+    )
+    return JsonResponse(
+        {
+            "results": rows[:STUDENTS_PAGE_SIZE],
+            "page": page,
+            "has_next": len(rows) > STUDENTS_PAGE_SIZE,
+        }
+    )
+
+
+def journal_title(year, issue_number):
+    return f"Jurnal {year}" + (f" {issue_number}-son" if issue_number else "")
+
+
+@require_GET
+def journal_search(request):
+    """Pages of active journal issues whose text matches ``q``, grouped by issue."""
+    query = (request.GET.get("q") or "").strip()
+    pages = JournalPage.objects.filter(issue__is_active=True)
+    matches = search.filter_queryset(pages, query) if query else None
+    if matches is None:
+        return JsonResponse({"results": [], "has_more": False})
+
+    rows = list(
+        matches.order_by("-issue__year", "-issue__created_at", "issue_id", "page_number")
+        .values("issue_id", "issue__year", "issue__issue_number", "page_number", "text")[
+            :JOURNAL_SEARCH_LIMIT + 1
+        ]
+    )
+    issues = {}
+    for row in rows[:JOURNAL_SEARCH_LIMIT]:
+        issue = issues.get(row["issue_id"])
+        if issue is None:
+            pdf_url = reverse("journal_pdf", args=[row["issue_id"]])
+            issue = issues[row["issue_id"]] = {
+                "id": row["issue_id"],
+                "title": journal_title(row["issue__year"], row["issue__issue_number"]),
+                "pdf_url": pdf_url,
+                "pages": [],
+            }
+        issue["pages"].append(
+            {
+                "page": row["page_number"],
+                "url": f"{issue['pdf_url']}#page={row['page_number']}",
+                "snippet": search.snippet(row["text"], query),
+            }
+        )
+    return JsonResponse({"results": list(issues.values()), "has_more": len(rows) > JOURNAL_SEARCH_LIMIT})
+
+
+@cache_public_page
 def open_data(request):
-    documents = Document.objects.filter(is_active=True).exclude(category="regulatory").order_by("-created_at")
+    documents = list(Document.objects.filter(is_active=True).exclude(category="regulatory").order_by("-created_at"))
+    # One query; the categories are split here instead of filtering again
+    by_category = {"open_data": [], "plan": []}
+    for document in documents:
+        by_category.setdefault(document.category, []).append(document)
     context = base_context("open_data")
     context.update(
         {
             "documents": documents,
-            "docs_open_data": documents.filter(category="open_data"),
-            "docs_plan": documents.filter(category="plan"),
+            "docs_open_data": by_category["open_data"],
+            "docs_plan": by_category["plan"],
         }
     )
     return render(request, "site/open_data.html", context)
 
 
+@cache_public_page
 def news_detail(request, news_id):
     news_item = get_object_or_404(News, pk=news_id, is_active=True)
     context = base_context(None)
@@ -286,7 +451,47 @@ def news_detail(request, news_id):
         {
             "news_item": news_item,
             "news_images": news_item.images.all().order_by("order"),
-            "related_news": News.objects.filter(is_active=True).exclude(pk=news_id).order_by("-created_at")[:3],
+            "related_news": news_cards(
+                News.objects.filter(is_active=True).exclude(pk=news_id).order_by("-created_at")[:3]
+            ),
         }
     )
     return render(request, "site/news_detail.html", context)
+
+
+def download_name(title, file):
+    """Readable download name: the title with the stored file's extension."""
+    extension = os.path.splitext(file.name)[1]
+    return f"{title}{extension}" if title else os.path.basename(file.name)
+
+
+@require_safe
+def journal_pdf(request, issue_id):
+    issue = get_object_or_404(JournalIssue, pk=issue_id, is_active=True)
+    title = journal_title(issue.year, issue.issue_number)
+    return serve_file(request, issue.pdf_file, download_name(title, issue.pdf_file))
+
+
+@require_safe
+def document_file(request, document_id):
+    document = get_object_or_404(Document, pk=document_id, is_active=True)
+    return serve_file(request, document.file, download_name(document.title, document.file))
+
+
+@require_safe
+def document_bundle(request, category):
+    """All active documents of a category as one zip, rebuilt only after the category changes."""
+    titles = dict(Document.CATEGORY_CHOICES)
+    if category not in titles:
+        raise Http404("Kategoriya topilmadi")
+    name = bundles.get_bundle(category)
+    if name is None:
+        raise Http404("Hujjatlar topilmadi")
+    field = Document._meta.get_field("file")
+    return serve_file(request, field.attr_class(None, field, name), f"{titles[category]}.zip")
+
+
+@require_safe
+def journal_rules_pdf(request):
+    rules = JournalSettings.get_instance().article_rules_pdf
+    return serve_file(request, rules, download_name("Maqola berish tartibi", rules) if rules else None)
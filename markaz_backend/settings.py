@@ -123,6 +123,10 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Store uploads by content hash (deduplicated, immutable names); see core/storage.py
+if os.environ.get('DJANGO_CONTENT_ADDRESSED_MEDIA') == '1':
+    DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -130,6 +134,64 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Cache
+# Local memory by default; point LOCATION at a directory and switch to
+# FileBasedCache to share the cache between worker processes without Redis.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'markaz-default',
+    },
+    # Values every worker must agree on (home sections, singleton version stamps)
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_SHARED_CACHE_DIR', str(BASE_DIR / 'cache' / 'shared')),
+    },
+    # Whole public pages, shared by all gunicorn workers
+    'pages': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_PAGE_CACHE_DIR', str(BASE_DIR / 'cache' / 'pages')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+}
+
+# Home page sections (news, teachers, ...) are cached separately and dropped
+# when one of their models is saved or deleted; see core/fragments.py.
+# Must be a cache all processes see: a delete in a local-memory cache only
+# reaches the worker that handled the write (or the import worker, which
+# updates the yearly counters), and the others keep serving stale sections.
+HOME_SECTION_CACHE_ALIAS = 'shared'
+HOME_SECTION_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
+
+# Anonymous full-page cache, versioned by content writes; see core/page_cache.py
+PAGE_CACHE_ALIAS = 'pages'
+PAGE_CACHE_TIMEOUT = 60 * 60  # 1 hour
+# Mixed into page cache keys and ETags; defaults to a hash of the templates and core code
+PAGE_CACHE_BUILD_VERSION = os.environ.get('DJANGO_BUILD_VERSION') or None
+
+# Statistics, AppContent, ... are cached per process; only their version
+# stamps live in this cache; see core/singletons.py
+SINGLETON_CACHE_ALIAS = 'shared'
+
+# Journal PDFs and documents are served by core.file_serving (Range, ETag, caching).
+# Set DJANGO_MEDIA_SENDFILE to 'x-accel-redirect' (nginx, with an internal location at
+# MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or 'x-sendfile' to let the web server send the bytes.
+MEDIA_FILE_CACHE_MAX_AGE = 60 * 60 * 24 * 30  # 30 days
+MEDIA_SENDFILE_BACKEND = os.environ.get('DJANGO_MEDIA_SENDFILE') or None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Resized WebP/JPEG copies written for every uploaded image; see core/images.py
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1280)
+
+# Uploaded images are oriented, capped to this size, stripped of EXIF and re-encoded
+IMAGE_UPLOAD_MAX_DIMENSION = 2560
+IMAGE_UPLOAD_QUALITY = 85
+
+# First page of uploaded journal PDFs is rendered as the cover at this width; see core/pdfs.py
+JOURNAL_COVER_WIDTH = 640
+
 # File Upload Settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10 MB
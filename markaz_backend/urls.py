@@ -15,6 +15,13 @@ urlpatterns = [
     path('students/', views.students, name='students'),
     path('open-data/', views.open_data, name='open_data'),
     path('news/<int:news_id>/', views.news_detail, name='news_detail'),
+    path('files/journal/<int:issue_id>/', views.journal_pdf, name='journal_pdf'),
+    path('files/journal/rules/', views.journal_rules_pdf, name='journal_rules_pdf'),
+    path('files/documents/<int:document_id>/', views.document_file, name='document_file'),
+    path('files/documents/<slug:category>.zip', views.document_bundle, name='document_bundle'),
+    path('api/verify/', views.verify_certificate, name='verify_certificate'),
+    path('api/students/search/', views.students_search, name='students_search'),
+    path('api/journal/search/', views.journal_search, name='journal_search'),
 ]
 
 if settings.DEBUG: